@@ -0,0 +1,190 @@
+"""
+Bulk-load helpers shared by the upload scripts: the CSV and COPY column
+layouts, row tuples to CSV for PostgreSQL COPY, staged COPY loads,
+location lookups, and the secondary indexes dropped around a load
+"""
+
+import csv
+import io
+from sqlalchemy import text
+
+# Written for None. Every COPY that reads these buffers has to declare it,
+# so use COPY_OPTIONS: csv.QUOTE_NONNUMERIC would write None as a quoted
+# "", which COPY reads as an empty string and fails to cast on typed columns
+COPY_NULL = r'\N'
+COPY_OPTIONS = rf"FORMAT csv, NULL '{COPY_NULL}'"
+
+def is_null(value):
+    """True for None and float NaN"""
+    # NaN is the only value not equal to itself
+    return value is None or (isinstance(value, float) and value != value)
+
+def copy_buffer(rows):
+    """Write row tuples to an in-memory CSV ready for COPY ... WITH (COPY_OPTIONS).
+    
+    None and NaN become COPY_NULL, written unquoted so COPY stores NULL.
+    NaN is how pandas hands back a missing value from a categorical or
+    object column, which would otherwise be stored as the text 'nan'.
+    Empty strings are written as empty fields and stay empty strings.
+    """
+    buf = io.StringIO()
+    csv.writer(buf).writerows(
+        [COPY_NULL if is_null(value) else value for value in row]
+        for row in rows
+    )
+    buf.seek(0)
+    return buf
+
+# Only the transaction columns we load, with explicit types so pandas
+# skips inference. Repeated names are stored as categoricals.
+TRANSACTION_COLUMNS = [
+    'Sale id', 'Sale Date', 'Location Name', 'Staff Name',
+    'Client Name', 'Service Name', 'Sale Type',
+    'Net Service Sales', 'Net Sales'
+]
+TRANSACTION_DTYPES = {
+    'Sale id': 'string',
+    'Location Name': 'category',
+    'Staff Name': 'category',
+    'Sale Type': 'category',
+    'Service Name': 'category',
+    'Client Name': 'string',
+    'Net Service Sales': 'float64',
+    'Net Sales': 'float64'
+}
+
+# Columns loaded with COPY, in the order row tuples are built
+TRANSACTION_COPY_COLUMNS = (
+    'sale_id, location_id, sale_date, client_name, staff_id, '
+    'service_name, sale_type, net_service_sales, net_sales'
+)
+TIME_CLOCK_COPY_COLUMNS = (
+    'timecard_id, staff_id, clock_date, clock_in, clock_out, '
+    'hours_clocked, minutes_clocked'
+)
+SCHEDULE_COPY_COLUMNS = (
+    'schedule_record_id, staff_id, location_id, schedule_date, '
+    'start_time, end_time'
+)
+
+# Statements reused for every chunk, built once
+SELECT_LOCATIONS = text("SELECT name, id FROM salon_locations")
+SELECT_STAFF = text("SELECT full_name, id FROM salon_staff")
+INSERT_LOCATIONS = text("""INSERT INTO salon_locations (name, is_active, created_at)
+    SELECT name, true, NOW() FROM unnest(CAST(:names AS text[])) AS name
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING name, id""")
+
+def copy_staged(session, table, columns, key, rows):
+    """Bulk load row tuples into table with COPY and commit.
+    
+    COPY has no ON CONFLICT, so the rows go into a temp copy of the table
+    first and are moved over with one INSERT ... SELECT that skips keys
+    already stored. Returns the number of rows inserted, or None if the
+    batch failed and was rolled back.
+    """
+    if not rows:
+        return 0
+    
+    # None and NaN go in as an explicit NULL marker
+    buf = copy_buffer(rows)
+    
+    try:
+        cur = session.connection().connection.cursor()
+        # A lost batch after a crash is simply reloaded, so don't wait for
+        # the WAL flush on commit. SET LOCAL ends with the batch and never
+        # leaks into the pooled connection.
+        cur.execute("SET LOCAL synchronous_commit = off")
+        cur.execute("SET LOCAL work_mem = '64MB'")
+        cur.execute(f"""CREATE TEMP TABLE staging_{table}
+            (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP""")
+        cur.copy_expert(f"COPY staging_{table} ({columns}) FROM STDIN WITH ({COPY_OPTIONS})", buf)
+        cur.execute(f"""INSERT INTO {table} ({columns}, created_at)
+            SELECT {columns}, NOW() FROM staging_{table}
+            ON CONFLICT ({key}) DO NOTHING""")
+        count = cur.rowcount
+        session.commit()
+        return count
+    except Exception as e:
+        session.rollback()
+        print(f"  ❌ Error loading batch of {len(rows)} rows into {table}: {e}")
+        return None
+
+def create_locations(session, names, loc_map):
+    """Insert locations missing from loc_map in one statement and add their IDs"""
+    new_names = sorted({name for name in names if isinstance(name, str) and name and name not in loc_map})
+    if not new_names:
+        return
+    
+    result = session.execute(INSERT_LOCATIONS, {"names": new_names})
+    loc_map.update(result.all())
+    # Commit now so a failed batch later can't roll back IDs held in loc_map
+    session.commit()
+
+def map_locations(session, names, loc_map):
+    """Map a column of location names to IDs, creating missing ones first.
+    
+    Returns an object Series of ints, with None where the name is missing.
+    """
+    names = names.astype(object)
+    location_ids = names.map(loc_map)
+    
+    missing = names[location_ids.isna()].dropna().unique()
+    if len(missing):
+        create_locations(session, missing, loc_map)
+        location_ids = names.map(loc_map)
+    
+    location_ids = location_ids.astype('Int64')
+    return location_ids.astype(object).where(location_ids.notna(), None)
+
+# Secondary indexes on the loaded tables (see salon_models). They are
+# dropped for a bulk load and rebuilt once afterwards; the unique keys
+# stay because ON CONFLICT needs them.
+SECONDARY_INDEXES = {
+    'idx_salon_transaction_date': 'salon_transactions (sale_date)',
+    'idx_salon_transaction_date_sales': 'salon_transactions (sale_date) INCLUDE (net_sales)',
+    'idx_salon_transaction_staff': 'salon_transactions (staff_id)',
+    'idx_salon_transaction_type': 'salon_transactions (sale_type)',
+    'idx_time_clock_date': 'salon_time_clock (clock_date)',
+    'idx_time_clock_staff': 'salon_time_clock (staff_id)',
+    'idx_schedule_date': 'salon_schedules (schedule_date)',
+    'idx_schedule_staff': 'salon_schedules (staff_id)',
+    'idx_schedule_location': 'salon_schedules (location_id)'
+}
+# The salon_transactions subset, for loads that only touch that table
+TRANSACTION_INDEXES = {
+    name: definition for name, definition in SECONDARY_INDEXES.items()
+    if definition.startswith('salon_transactions ')
+}
+
+# An index left INVALID by a cancelled CREATE INDEX CONCURRENTLY
+SELECT_INVALID_INDEX = text("""SELECT 1 FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = :name AND NOT i.indisvalid""")
+
+def drop_indexes(session, indexes):
+    """Drop indexes so the load doesn't maintain them per row, and commit"""
+    for name in indexes:
+        session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    session.commit()
+
+def rebuild_indexes(engine, indexes):
+    """Recreate indexes dropped by drop_indexes.
+    
+    Errors propagate: a failed build must not be reported as done.
+    """
+    # CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # A build on a full table can outlast the engine's statement_timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("SET maintenance_work_mem = '256MB'"))
+        try:
+            for name, definition in indexes.items():
+                # A cancelled build leaves an INVALID index behind, which
+                # IF NOT EXISTS would then skip on every later run
+                if conn.execute(SELECT_INVALID_INDEX, {"name": name}).first():
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+        finally:
+            conn.execute(text("RESET maintenance_work_mem"))
+            conn.execute(text("RESET statement_timeout"))
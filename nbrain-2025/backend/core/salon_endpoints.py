@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Header, Request
 from typing import Dict, Any, List, Optional
 from datetime import datetime, date
+import gzip
 import json
 import math
+import os
+import re
+import tempfile
+import time
 
 from .auth import get_current_active_user
 from .database import SessionLocal, get_db, User
@@ -19,6 +24,22 @@ from sqlalchemy import func, desc
 router = APIRouter(prefix="/api/salon", tags=["salon"])
 salon_handler = SalonAnalyticsHandler()
 
+# Ingest function for each upload kind, used by the chunked and batch upload endpoints
+UPLOAD_INGESTERS = {
+    'staff': salon_handler.ingest_staff_data,
+    'performance': salon_handler.ingest_performance_data,
+    'transactions': salon_handler.ingest_transaction_data,
+    'timeclock': salon_handler.ingest_time_clock_data,
+    'schedules': salon_handler.ingest_schedule_data,
+}
+
+# Chunked uploads are assembled here until the client marks them complete.
+# Each upload's .part file has a .ranges sidecar listing the byte ranges
+# received so far.
+CHUNK_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'salon_uploads')
+# Partial uploads untouched for this long are deleted
+CHUNK_UPLOAD_TTL = 24 * 60 * 60
+
 def sanitize_float_value(value: Any) -> Any:
     """Ensure float values are JSON-compliant (no NaN, infinity)"""
     if value is None:
@@ -51,11 +72,11 @@ async def upload_staff_data(
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload employee list CSV file"""
-    if not file.filename.endswith('.csv'):
+    if not file.filename.endswith(('.csv', '.csv.gz')):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted")
     
     content = await file.read()
-    result = salon_handler.ingest_staff_data(content.decode())
+    result = salon_handler.ingest_staff_data(_decode_csv(content, file.filename.endswith('.gz')))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['error'])
@@ -68,11 +89,11 @@ async def upload_performance_data(
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload staff performance CSV file"""
-    if not file.filename.endswith('.csv'):
+    if not file.filename.endswith(('.csv', '.csv.gz')):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted")
     
     content = await file.read()
-    result = salon_handler.ingest_performance_data(content.decode())
+    result = salon_handler.ingest_performance_data(_decode_csv(content, file.filename.endswith('.gz')))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['error'])
@@ -85,11 +106,11 @@ async def upload_transaction_data(
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload detailed line item transaction CSV file"""
-    if not file.filename.endswith('.csv'):
+    if not file.filename.endswith(('.csv', '.csv.gz')):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted")
     
     content = await file.read()
-    result = salon_handler.ingest_transaction_data(content.decode())
+    result = salon_handler.ingest_transaction_data(_decode_csv(content, file.filename.endswith('.gz')))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['error'])
@@ -102,11 +123,11 @@ async def upload_time_clock_data(
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload time clock CSV file"""
-    if not file.filename.endswith('.csv'):
+    if not file.filename.endswith(('.csv', '.csv.gz')):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted")
     
     content = await file.read()
-    result = salon_handler.ingest_time_clock_data(content.decode())
+    result = salon_handler.ingest_time_clock_data(_decode_csv(content, file.filename.endswith('.gz')))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['error'])
@@ -119,17 +140,189 @@ async def upload_schedule_data(
     current_user: User = Depends(get_current_active_user)
 ):
     """Upload schedule records CSV file"""
-    if not file.filename.endswith('.csv'):
+    if not file.filename.endswith(('.csv', '.csv.gz')):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted")
     
     content = await file.read()
-    result = salon_handler.ingest_schedule_data(content.decode())
+    result = salon_handler.ingest_schedule_data(_decode_csv(content, file.filename.endswith('.gz')))
+    
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['error'])
+    
+    return result
+
+def _decode_csv(content: bytes, gzipped: bool) -> str:
+    """CSV text of an upload, decompressing it if the client gzipped it"""
+    if gzipped:
+        content = gzip.decompress(content)
+    return content.decode()
+
+def _chunk_upload_path(kind: str, upload_id: str) -> str:
+    """Path of the partial file for a chunked upload"""
+    if kind not in UPLOAD_INGESTERS:
+        raise HTTPException(status_code=404, detail=f"Unknown upload type: {kind}")
+    # The id becomes a file name, so only accept what the client generates
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+        raise HTTPException(status_code=400, detail="Invalid upload id")
+    return os.path.join(CHUNK_UPLOAD_DIR, f"{kind}-{upload_id}.part")
+
+def _remove_chunk_upload(path: str):
+    """Delete a partial upload and its ranges sidecar"""
+    for p in (path, path + '.ranges'):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+def _expire_chunk_uploads():
+    """Delete partial uploads abandoned for longer than CHUNK_UPLOAD_TTL"""
+    cutoff = time.time() - CHUNK_UPLOAD_TTL
+    with os.scandir(CHUNK_UPLOAD_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def _missing_chunks(path: str, size: int) -> Optional[str]:
+    """Why the upload at path doesn't cover bytes 0..size-1 yet, or None if it does"""
+    received = []
+    with open(path + '.ranges') as f:
+        for line in f:
+            start, end, total = map(int, line.split())
+            if total != size:
+                return f"Chunks were sent for a {total}-byte upload"
+            received.append((start, end))
+    
+    # The file's size alone proves nothing: writing the last chunk first
+    # gives a sparse file of full size with zeros where chunks are missing
+    covered = 0
+    for start, end in sorted(received):
+        if start > covered:
+            break
+        covered = max(covered, end + 1)
+    if covered < size:
+        return f"Upload is incomplete: bytes from {covered} were never received"
+    return None
+
+@router.put("/upload/{kind}/chunk")
+async def upload_chunk(
+    kind: str,
+    request: Request,
+    x_upload_id: str = Header(...),
+    content_range: str = Header(...),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Store one byte range of a large CSV; chunks may arrive in any order"""
+    path = _chunk_upload_path(kind, x_upload_id)
+    
+    match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+)', content_range)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range")
+    start, end, total = map(int, match.groups())
+    
+    content = await request.body()
+    if len(content) != end - start + 1 or end >= total:
+        raise HTTPException(status_code=400, detail="Chunk does not match Content-Range")
+    
+    os.makedirs(CHUNK_UPLOAD_DIR, exist_ok=True)
+    # Sweep abandoned uploads whenever a new one starts
+    if not os.path.exists(path):
+        _expire_chunk_uploads()
+    
+    # Write at the chunk's offset, so a retried chunk simply overwrites itself
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        os.pwrite(fd, content, start)
+    finally:
+        os.close(fd)
+    
+    # Record the range only once its bytes are written. One short
+    # O_APPEND write per chunk, so concurrent chunks don't interleave.
+    fd = os.open(path + '.ranges', os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    try:
+        os.write(fd, f"{start} {end} {total}\n".encode())
+    finally:
+        os.close(fd)
+    
+    return {"received": len(content)}
+
+@router.post("/upload/{kind}/complete")
+async def complete_chunked_upload(
+    kind: str,
+    x_upload_id: str = Header(...),
+    x_upload_size: int = Header(...),
+    x_upload_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Ingest a chunked upload once every chunk has been stored"""
+    path = _chunk_upload_path(kind, x_upload_id)
+    
+    if not os.path.exists(path + '.ranges'):
+        raise HTTPException(status_code=404, detail="Unknown upload id")
+    
+    # The client starts over with a new upload id after a failure, so an
+    # incomplete upload is deleted rather than kept for resuming
+    problem = _missing_chunks(path, x_upload_size)
+    if problem:
+        _remove_chunk_upload(path)
+        raise HTTPException(status_code=400, detail=problem)
+    
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+    finally:
+        _remove_chunk_upload(path)
+    
+    result = UPLOAD_INGESTERS[kind](_decode_csv(content, x_upload_encoding == 'gzip'))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['error'])
     
     return result
 
+@router.post("/upload/batch")
+async def upload_batch(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload several small CSV files in one request.
+    
+    The `kinds` form field is a JSON object mapping each file part's name to
+    its upload type. Parts are ingested in that order and each gets its own
+    result, so one bad file doesn't fail the others.
+    """
+    form = await request.form()
+    try:
+        kinds = json.loads(form['kinds'])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Missing or invalid kinds")
+    
+    # Check every part before ingesting any of them
+    for part, kind in kinds.items():
+        if kind not in UPLOAD_INGESTERS:
+            raise HTTPException(status_code=404, detail=f"Unknown upload type: {kind}")
+        file = form.get(part)
+        if file is None or isinstance(file, str):
+            raise HTTPException(status_code=400, detail=f"Missing file part: {part}")
+        if not file.filename.endswith(('.csv', '.csv.gz')):
+            raise HTTPException(status_code=400, detail="Only CSV files are accepted")
+    
+    results = {}
+    for part, kind in kinds.items():
+        file = form[part]
+        # Parts before this one may already be committed, so a bad part
+        # (corrupt gzip, wrong encoding) only fails its own result, in the
+        # same shape the ingesters use
+        try:
+            content = await file.read()
+            results[part] = UPLOAD_INGESTERS[kind](_decode_csv(content, file.filename.endswith('.gz')))
+        except Exception as e:
+            results[part] = {"success": False, "error": str(e)}
+    
+    return results
+
 @router.post("/analytics/query")
 async def process_analytics_query(
     query: Dict[str, str],
@@ -209,6 +209,7 @@ class SalonTransaction(Base):
     # Indexes
     __table_args__ = (
         Index('idx_salon_transaction_date', 'sale_date'),
+        Index('idx_salon_transaction_date_sales', 'sale_date', postgresql_include=['net_sales']),
         Index('idx_salon_transaction_staff', 'staff_id'),
         Index('idx_salon_transaction_type', 'sale_type'),
     )
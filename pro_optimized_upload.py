@@ -7,15 +7,19 @@ Takes advantage of increased resources for faster uploads
 import os
 import sys
 import pandas as pd
+from collections import defaultdict
 from datetime import date, timedelta
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
+from psycopg2.extras import execute_batch
 import time
 import gc
 from concurrent.futures import ThreadPoolExecutor
 import threading
 
+from copy_csv import TRANSACTION_INDEXES, drop_indexes, rebuild_indexes
+
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL', '')
 
@@ -35,54 +39,79 @@ engine = create_engine(
         'options': '-c statement_timeout=60000'  # Increased timeout
     }
 )
-Session = sessionmaker(bind=engine)
+# Raw-SQL script: no ORM objects to autoflush or expire
+Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 # Optimized batch size for Pro tier
 BATCH_SIZE = 2000  # Increased from 500
 
+# Rows per CSV chunk when streaming the transaction file
+CSV_CHUNK_SIZE = 200_000
+
 # Continue from Jan 14 onwards
 START_DATE = date(2025, 1, 14)
 END_DATE = date(2025, 1, 31)  # Rest of January
 
-def get_existing_sale_ids(session, target_date):
-    """Get existing sale IDs for a date to avoid duplicates"""
-    result = session.execute(
-        text("""
-        SELECT sale_id 
-        FROM salon_transactions 
-        WHERE sale_date = :target_date
-        """),
-        {"target_date": target_date}
-    )
-    return set(row[0] for row in result)
+def _disable_indexes(session):
+    """Drop secondary indexes so bulk inserts skip per-row B-tree updates"""
+    drop_indexes(session, TRANSACTION_INDEXES)
+    print(f"  Dropped {len(TRANSACTION_INDEXES)} secondary indexes for bulk load")
+
+def _recreate_indexes():
+    """Rebuild the secondary indexes dropped by _disable_indexes"""
+    rebuild_indexes(engine, TRANSACTION_INDEXES)
+    print(f"  Recreated {len(TRANSACTION_INDEXES)} secondary indexes")
+
+def prefetch_existing_ids(start_date, end_date):
+    """Get existing sale IDs for the whole date range, bucketed by day"""
+    existing_by_day = defaultdict(set)
+    session = Session()
+    try:
+        # One range scan instead of one index lookup per day; stream the
+        # rows so large ranges don't materialize in memory all at once
+        result = session.execute(
+            text("""
+            SELECT sale_date, sale_id 
+            FROM salon_transactions 
+            WHERE sale_date BETWEEN :start_date AND :end_date
+            """).execution_options(stream_results=True, yield_per=50000),
+            {"start_date": start_date, "end_date": end_date}
+        )
+        for sale_date, sale_id in result:
+            existing_by_day[sale_date].add(sale_id)
+    finally:
+        session.close()
+    return existing_by_day
 
 def bulk_insert_batch(session, batch_data):
-    """Bulk insert a batch of records"""
+    """Bulk insert a batch of records (the caller commits)"""
     if not batch_data:
         return 0
     
-    try:
-        # Use executemany for better performance
-        session.execute(
-            text("""INSERT INTO salon_transactions 
-            (sale_id, location_id, sale_date, client_name, 
-             staff_id, service_name, sale_type, 
-             net_service_sales, net_sales, created_at)
-            VALUES (:sale_id, :loc, :sale_date, :client, 
-                    :staff, :service, :sale_type,
-                    :net_service, :net_sales, NOW())
-            ON CONFLICT (sale_id) DO NOTHING"""),
-            batch_data
-        )
-        session.commit()
-        return len(batch_data)
-    except Exception as e:
-        print(f"\n  ⚠️  Error in bulk insert: {e}")
-        session.rollback()
-        return 0
+    # execute_batch packs page_size statements into each round-trip,
+    # unlike plain executemany which sends them one at a time
+    cursor = session.connection().connection.cursor()
+    execute_batch(
+        cursor,
+        """INSERT INTO salon_transactions 
+        (sale_id, location_id, sale_date, client_name, 
+         staff_id, service_name, sale_type, 
+         net_service_sales, net_sales, created_at)
+        VALUES (%(sale_id)s, %(loc)s, %(sale_date)s, %(client)s, 
+                %(staff)s, %(service)s, %(sale_type)s,
+                %(net_service)s, %(net_sales)s, NOW())
+        ON CONFLICT (sale_id) DO NOTHING""",
+        batch_data,
+        page_size=500
+    )
+    return len(batch_data)
 
-def process_transactions_for_date(target_date):
-    """Process transaction data for a specific date - optimized for Pro tier"""
+def process_transactions_for_date(target_date, existing_ids):
+    """Process transaction data for a specific date - optimized for Pro tier.
+    
+    Returns the number of new rows, which is 0 for a day with no data or
+    one that is already loaded, or None if the day failed and rolled back.
+    """
     print(f"\n📊 Processing Transactions for {target_date}...")
     
     file_path = 'blazer/Detailed Line Item 2025 071825.csv'
@@ -92,13 +121,20 @@ def process_transactions_for_date(target_date):
     errors = 0
     
     try:
-        # Get existing sale IDs to skip
-        existing_ids = get_existing_sale_ids(session, target_date)
+        # Existing sale IDs to skip are prefetched for the whole run
         if existing_ids:
             print(f"  Found {len(existing_ids)} existing transactions, will skip these")
         
-        # Read data with optimized dtypes
-        df = pd.read_csv(file_path, 
+        # Pre-fetched locations and staff, filled in as new names appear
+        locations = {}
+        staff_map = {}
+        total_found = 0
+        
+        # Process in larger batches
+        batch_data = []
+        
+        # Stream the file so peak memory is bounded by CSV_CHUNK_SIZE
+        for df in pd.read_csv(file_path, 
             usecols=[
                 'Sale id', 'Sale Date', 'Location Name', 'Staff Name',
                 'Client Name', 'Service Name', 'Sale Type',
@@ -106,113 +142,119 @@ def process_transactions_for_date(target_date):
             ],
             dtype={
                 'Sale id': str,
-                'Location Name': str,
-                'Staff Name': str,
+                # Low-cardinality text: store each distinct value once
+                'Location Name': 'category',
+                'Staff Name': 'category',
                 'Client Name': str,
-                'Service Name': str,
-                'Sale Type': str
-            }
-        )
-        
-        # Parse dates and filter for target date
-        df['Sale Date'] = pd.to_datetime(df['Sale Date'], errors='coerce')
-        df = df[df['Sale Date'].notna()]
-        df = df[df['Sale Date'].dt.date == target_date]
-        
-        # Skip summary rows
-        df = df[df['Sale id'] != 'All']
-        df = df[df['Sale id'].notna()]
-        
-        print(f"  Found {len(df)} total transactions for {target_date}")
-        
-        if len(df) == 0:
-            print("  No data found for this date!")
-            return 0
-        
-        # Pre-fetch all locations and staff for better performance
-        locations = {}
-        staff_map = {}
-        
-        # Get all unique locations
-        unique_locations = df['Location Name'].dropna().unique()
-        for loc_name in unique_locations:
-            location = session.execute(
-                text("SELECT id FROM salon_locations WHERE name = :name"),
-                {"name": loc_name}
-            ).first()
+                'Service Name': 'category',
+                'Sale Type': 'category'
+            },
+            parse_dates=['Sale Date'],
+            cache_dates=True,  # ~365 distinct dates per file, parse each once
+            chunksize=CSV_CHUNK_SIZE
+        ):
+            # Filter for target date
+            df = df[df['Sale Date'].notna()]
+            df['sale_date_only'] = df['Sale Date'].dt.date
+            df = df[df['sale_date_only'] == target_date]
+            
+            # Skip summary rows
+            df = df[df['Sale id'] != 'All']
+            df = df[df['Sale id'].notna()]
+            
+            if len(df) == 0:
+                continue
+            total_found += len(df)
+            
+            # Blank out missing text once so NaN never reaches the insert
+            # (psycopg2 would store it as the string 'NaN')
+            for column in ['Client Name', 'Service Name', 'Sale Type']:
+                df[column] = df[column].astype(object).fillna('').astype(str)
+            
+            # Convert amounts for the whole chunk at once
+            df['net_service'] = pd.to_numeric(df['Net Service Sales'], errors='coerce').fillna(0.0)
+            df['net_sales'] = pd.to_numeric(df['Net Sales'], errors='coerce').fillna(0.0)
             
-            if not location:
+            # Resolve any locations not seen in earlier chunks
+            for loc_name in df['Location Name'].cat.remove_unused_categories().cat.categories:
+                if loc_name in locations:
+                    continue
+                # Get-or-create in one round-trip; the no-op DO UPDATE makes
+                # RETURNING yield the id of an existing row too
                 result = session.execute(
-                    text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
+                    text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) "
+                         "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id"),
                     {"name": loc_name}
                 )
                 locations[loc_name] = result.first()[0]
-            else:
-                locations[loc_name] = location[0]
-        
-        # Get all unique staff
-        unique_staff = df['Staff Name'].dropna().unique()
-        for staff_name in unique_staff:
-            if staff_name and staff_name != 'No Staff':
-                staff = session.execute(
-                    text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                    {"name": staff_name}
-                ).first()
-                if staff:
-                    staff_map[staff_name] = staff[0]
-        
-        # Process in larger batches
-        batch_data = []
-        
-        for idx, row in df.iterrows():
-            try:
-                # Skip if already exists
-                if row['Sale id'] in existing_ids:
-                    skipped += 1
-                    continue
-                
-                location_name = row['Location Name']
-                if pd.isna(location_name) or location_name not in locations:
+            
+            # Resolve any staff not seen in earlier chunks
+            for staff_name in df['Staff Name'].cat.remove_unused_categories().cat.categories:
+                if staff_name and staff_name != 'No Staff' and staff_name not in staff_map:
+                    staff = session.execute(
+                        text("SELECT id FROM salon_staff WHERE full_name = :name"),
+                        {"name": staff_name}
+                    ).first()
+                    staff_map[staff_name] = staff[0] if staff else None
+            
+            for idx, row in df.iterrows():
+                try:
+                    # Skip if already exists
+                    if row['Sale id'] in existing_ids:
+                        skipped += 1
+                        continue
+                    
+                    location_name = row['Location Name']
+                    if pd.isna(location_name) or location_name not in locations:
+                        continue
+                    
+                    staff_name = row.get('Staff Name', '')
+                    staff_id = None
+                    if staff_name and not pd.isna(staff_name) and staff_name in staff_map:
+                        staff_id = staff_map[staff_name]
+                    
+                    # Add to batch
+                    batch_data.append({
+                        "sale_id": row['Sale id'],
+                        "loc": locations[location_name],
+                        "sale_date": row['sale_date_only'],
+                        "client": row['Client Name'],
+                        "staff": staff_id,
+                        "service": row['Service Name'],
+                        "sale_type": row['Sale Type'],
+                        "net_service": row['net_service'],
+                        "net_sales": row['net_sales']
+                    })
+                        
+                except Exception as e:
+                    errors += 1
+                    if errors <= 3:
+                        print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e}")
                     continue
                 
-                staff_name = row.get('Staff Name', '')
-                staff_id = None
-                if staff_name and not pd.isna(staff_name) and staff_name in staff_map:
-                    staff_id = staff_map[staff_name]
-                
-                # Add to batch
-                batch_data.append({
-                    "sale_id": row['Sale id'],
-                    "loc": locations[location_name],
-                    "sale_date": row['Sale Date'].date(),
-                    "client": row.get('Client Name', ''),
-                    "staff": staff_id,
-                    "service": row.get('Service Name', ''),
-                    "sale_type": row.get('Sale Type', ''),
-                    "net_service": float(row.get('Net Service Sales', 0) or 0),
-                    "net_sales": float(row.get('Net Sales', 0) or 0)
-                })
-                
-                # Insert batch when it reaches BATCH_SIZE
+                # Insert batch when it reaches BATCH_SIZE. A failure here
+                # aborts the whole day (see the rollback below).
                 if len(batch_data) >= BATCH_SIZE:
                     inserted = bulk_insert_batch(session, batch_data)
                     count += inserted
                     print(f"    Processed {count} new transactions...", end='\r')
                     batch_data = []
-                    
-            except Exception as e:
-                errors += 1
-                if errors <= 3:
-                    print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e}")
-                continue
+        
+        print(f"\n  Found {total_found} total transactions for {target_date}")
+        
+        if total_found == 0:
+            print("  No data found for this date!")
+            return 0
         
         # Insert remaining batch
         if batch_data:
             inserted = bulk_insert_batch(session, batch_data)
             count += inserted
         
-        # Clear dataframe from memory
-        del df
+        # One commit per day: the day is loaded entirely or not at all
+        session.commit()
+        
+        # Release the last chunk before the next day
         gc.collect()
         
         print(f"\n  ✅ Uploaded {count} new transactions for {target_date}")
@@ -224,6 +266,7 @@ def process_transactions_for_date(target_date):
     except Exception as e:
         print(f"\n  ❌ Error processing transactions: {e}")
         session.rollback()
+        count = None
         import traceback
         traceback.print_exc()
     finally:
@@ -235,38 +278,38 @@ def check_progress():
     """Check current upload progress"""
     session = Session()
     try:
-        # Get summary by month
+        # Monthly summary and daily breakdown from a single scan
         result = session.execute(text("""
             SELECT 
+                GROUPING(sale_date) = 1 as is_month,
                 DATE_TRUNC('month', sale_date) as month,
+                sale_date,
                 COUNT(*) as count,
                 MIN(sale_date) as first_date,
                 MAX(sale_date) as last_date
             FROM salon_transactions
             WHERE sale_date >= '2025-01-01'
-            GROUP BY DATE_TRUNC('month', sale_date)
-            ORDER BY month
+            GROUP BY GROUPING SETS ((DATE_TRUNC('month', sale_date)), (sale_date))
+            ORDER BY is_month DESC, month, sale_date
         """))
         
+        monthly = []
+        daily = []
+        for row in result:
+            (monthly if row.is_month else daily).append(row)
+        
         print("\n📈 Current progress by month:")
         total = 0
-        for row in result:
+        for row in monthly:
             print(f"  {row.month.strftime('%B %Y')}: {row.count:,} transactions ({row.first_date} to {row.last_date})")
             total += row.count
         print(f"  Total 2025: {total:,} transactions")
         
-        # Get daily breakdown for current month
-        result = session.execute(text("""
-            SELECT sale_date, COUNT(*) as count
-            FROM salon_transactions
-            WHERE sale_date >= '2025-01-01' AND sale_date < '2025-02-01'
-            GROUP BY sale_date
-            ORDER BY sale_date
-        """))
-        
+        # Daily breakdown for current month
         print("\n📊 January 2025 daily breakdown:")
-        for row in result:
-            print(f"  {row.sale_date}: {row.count:,} transactions")
+        for row in daily:
+            if row.sale_date < date(2025, 2, 1):
+                print(f"  {row.sale_date}: {row.count:,} transactions")
         
     except Exception as e:
         print(f"Error checking progress: {e}")
@@ -298,34 +341,55 @@ def main():
     successful_days = []
     failed_days = []
     
-    # Process each day
-    current_date = START_DATE
-    while current_date <= END_DATE:
-        day_start = time.time()
-        day_count = process_transactions_for_date(current_date)
-        day_time = time.time() - day_start
-        
-        if day_count > 0:
-            successful_days.append((current_date, day_count, day_time))
-            total_count += day_count
-            print(f"  ⏱️  Time for {current_date}: {day_time:.1f} seconds ({day_count/day_time:.1f} records/sec)")
-        else:
-            failed_days.append(current_date)
-        
-        # Save progress after each day
-        print(f"  💾 Progress saved. Can resume from {current_date + timedelta(days=1)} if interrupted.")
-        
-        # Minimal pause between days (Pro tier can handle it)
-        if current_date < END_DATE and day_count > 0:
-            time.sleep(0.5)
-        
-        current_date += timedelta(days=1)
+    # Fetch existing sale IDs for the whole range in one query
+    existing_by_day = prefetch_existing_ids(START_DATE, END_DATE)
+    
+    # Drop secondary indexes for the duration of the bulk load
+    session = Session()
+    try:
+        _disable_indexes(session)
+    finally:
+        session.close()
+    
+    try:
+        # Process each day
+        current_date = START_DATE
+        while current_date <= END_DATE:
+            day_start = time.time()
+            day_count = process_transactions_for_date(current_date, existing_by_day[current_date])
+            day_time = time.time() - day_start
+            
+            # None means the day rolled back; 0 is a day with nothing new
+            if day_count is None:
+                failed_days.append(current_date)
+                print(f"  ⚠️  {current_date} was not loaded; resume from it to retry.")
+            else:
+                if day_count > 0:
+                    successful_days.append((current_date, day_count, day_time))
+                    total_count += day_count
+                    print(f"  ⏱️  Time for {current_date}: {day_time:.1f} seconds ({day_count/day_time:.1f} records/sec)")
+                # Each day commits on its own, so everything up to the first
+                # failed day is loaded
+                resume_date = failed_days[0] if failed_days else current_date + timedelta(days=1)
+                print(f"  💾 Progress saved. Can resume from {resume_date} if interrupted.")
+            
+            # Minimal pause between days (Pro tier can handle it)
+            if current_date < END_DATE and day_count:
+                time.sleep(0.5)
+            
+            current_date += timedelta(days=1)
+    finally:
+        # Always restore the indexes, even if the upload was interrupted
+        _recreate_indexes()
     
     # Final summary
     elapsed = time.time() - start_time
     
     print("\n" + "=" * 60)
-    print("✅ UPLOAD COMPLETE")
+    if failed_days:
+        print("⚠️  UPLOAD INCOMPLETE")
+    else:
+        print("✅ UPLOAD COMPLETE")
     print("=" * 60)
     print(f"Time taken: {elapsed:.1f} seconds ({elapsed/60:.1f} minutes)")
     print(f"Total new records uploaded: {total_count:,}")
@@ -342,7 +406,7 @@ def main():
         print(f"\n  Average: {total_records/total_time:.1f} records/second")
     
     if failed_days:
-        print("\n⚠️  No data found for:")
+        print("\n❌ Failed and rolled back (re-run to retry):")
         for day in failed_days:
             print(f"  {day}")
     
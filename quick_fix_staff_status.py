@@ -26,46 +26,51 @@ def fix_staff_status():
     print("=" * 60)
     
     try:
-        # Check current status
-        print("\n1. Current staff status distribution:")
+        # Read the distribution and apply the update in one statement. All
+        # CTEs see the same snapshot, so "before" excludes the update.
         result = session.execute(text("""
-            SELECT position_status, COUNT(*) as count
-            FROM salon_staff
-            GROUP BY position_status
+            WITH before AS (
+                SELECT position_status, COUNT(*) as count
+                FROM salon_staff
+                GROUP BY position_status
+            ),
+            updated AS (
+                UPDATE salon_staff 
+                SET position_status = 'A' 
+                WHERE position_status = 'A - Active'
+                RETURNING position_status
+            )
+            SELECT position_status, count,
+                   (SELECT COUNT(*) FROM updated) as rows_updated
+            FROM before
             ORDER BY position_status
         """))
+        rows = result.fetchall()
+        session.commit()
         
-        for row in result:
+        print("\n1. Current staff status distribution:")
+        before = {}
+        for row in rows:
             status = row.position_status or 'NULL'
             print(f"   {status}: {row.count} staff")
+            before[status] = row.count
         
-        # Update 'A - Active' to 'A'
+        rows_updated = rows[0].rows_updated if rows else 0
         print("\n2. Updating staff status...")
-        result = session.execute(text("""
-            UPDATE salon_staff 
-            SET position_status = 'A' 
-            WHERE position_status = 'A - Active'
-        """))
-        
-        rows_updated = result.rowcount
-        session.commit()
         print(f"   ✓ Updated {rows_updated} staff records")
         
-        # Verify the fix
-        print("\n3. New staff status distribution:")
-        result = session.execute(text("""
-            SELECT position_status, COUNT(*) as count
-            FROM salon_staff
-            GROUP BY position_status
-            ORDER BY position_status
-        """))
+        # Derive the new distribution from the old one plus the update
+        after = dict(before)
+        if rows_updated:
+            after['A'] = after.get('A', 0) + rows_updated
+            after['A - Active'] -= rows_updated
+            if not after['A - Active']:
+                del after['A - Active']
         
-        active_count = 0
-        for row in result:
-            status = row.position_status or 'NULL'
-            print(f"   {status}: {row.count} staff")
-            if status == 'A':
-                active_count = row.count
+        print("\n3. New staff status distribution:")
+        for status in sorted(after):
+            print(f"   {status}: {after[status]} staff")
+        active_count = after.get('A', 0)
         
         print("\n" + "=" * 60)
         print("✅ FIX COMPLETE")
@@ -9,8 +9,8 @@ import sys
 import pandas as pd
 from datetime import date
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
 import time
 
 # Database URL
@@ -20,16 +20,19 @@ if not DATABASE_URL:
     print("Please set your DATABASE_URL environment variable")
     sys.exit(1)
 
-# Create engine with NullPool to minimize connections
+# Small pool so the session keeps reusing one connection
 engine = create_engine(
     DATABASE_URL, 
-    poolclass=NullPool,
+    pool_size=2,
+    max_overflow=0,
+    pool_pre_ping=True,
     connect_args={
         'connect_timeout': 10,
         'options': '-c statement_timeout=30000'
     }
 )
-Session = sessionmaker(bind=engine)
+# Raw-SQL script: no ORM objects to autoflush or expire
+Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 # Target date: Jan 2, 2025 (since Jan 1 has no data)
 TARGET_DATE = date(2025, 1, 2)
@@ -94,60 +97,77 @@ def upload_single_day_transactions():
             print("  No data found for this date!")
             return 0
         
+        # Filter duplicates up front so the error path below stays cold
+        seen_ids = set(
+            r[0] for r in session.execute(
+                text("SELECT sale_id FROM salon_transactions WHERE sale_date = :target_date"),
+                {"target_date": TARGET_DATE}
+            )
+        )
+        
         # Process each transaction
         for idx, row in df.iterrows():
+            if row['Sale id'] in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(row['Sale id'])
+            
+            # Rows without a location are skipped
+            location_name = row['Location Name']
+            if pd.isna(location_name):
+                continue
+            
             try:
-                # Get or create location
-                location_name = row['Location Name']
-                if pd.isna(location_name):
-                    continue
-                
-                location = session.execute(
-                    text("SELECT id FROM salon_locations WHERE name = :name"),
-                    {"name": location_name}
-                ).first()
-                
-                if not location:
-                    result = session.execute(
-                        text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
+                # Savepoint per row: a bad row rolls back only itself, not
+                # the rows inserted since the last commit
+                with session.begin_nested():
+                    # Get or create location
+                    location = session.execute(
+                        text("SELECT id FROM salon_locations WHERE name = :name"),
                         {"name": location_name}
-                    )
-                    location_id = result.first()[0]
-                else:
-                    location_id = location[0]
-                
-                # Get staff (optional)
-                staff_name = row.get('Staff Name', '')
-                staff_id = None
-                
-                if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
-                    staff = session.execute(
-                        text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                        {"name": staff_name}
                     ).first()
-                    staff_id = staff[0] if staff else None
-                
-                # Insert transaction (without ON CONFLICT since we cleared the table)
-                session.execute(
-                    text("""INSERT INTO salon_transactions 
-                    (sale_id, location_id, sale_date, client_name, 
-                     staff_id, service_name, sale_type, 
-                     net_service_sales, net_sales, created_at)
-                    VALUES (:sale_id, :loc, :sale_date, :client, 
-                            :staff, :service, :sale_type,
-                            :net_service, :net_sales, NOW())"""),
-                    {
-                        "sale_id": row['Sale id'],
-                        "loc": location_id,
-                        "sale_date": row['Sale Date'].date(),
-                        "client": row.get('Client Name', ''),
-                        "staff": staff_id,
-                        "service": row.get('Service Name', ''),
-                        "sale_type": row.get('Sale Type', ''),
-                        "net_service": float(row.get('Net Service Sales', 0) or 0),
-                        "net_sales": float(row.get('Net Sales', 0) or 0)
-                    }
-                )
+                    
+                    if not location:
+                        result = session.execute(
+                            text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
+                            {"name": location_name}
+                        )
+                        location_id = result.first()[0]
+                    else:
+                        location_id = location[0]
+                    
+                    # Get staff (optional)
+                    staff_name = row.get('Staff Name', '')
+                    staff_id = None
+                    
+                    if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
+                        staff = session.execute(
+                            text("SELECT id FROM salon_staff WHERE full_name = :name"),
+                            {"name": staff_name}
+                        ).first()
+                        staff_id = staff[0] if staff else None
+                    
+                    # Insert transaction (without ON CONFLICT since we cleared the table)
+                    session.execute(
+                        text("""INSERT INTO salon_transactions 
+                        (sale_id, location_id, sale_date, client_name, 
+                         staff_id, service_name, sale_type, 
+                         net_service_sales, net_sales, created_at)
+                        VALUES (:sale_id, :loc, :sale_date, :client, 
+                                :staff, :service, :sale_type,
+                                :net_service, :net_sales, NOW())"""),
+                        {
+                            "sale_id": row['Sale id'],
+                            "loc": location_id,
+                            "sale_date": row['Sale Date'].date(),
+                            "client": row.get('Client Name', ''),
+                            "staff": staff_id,
+                            "service": row.get('Service Name', ''),
+                            "sale_type": row.get('Sale Type', ''),
+                            "net_service": float(row.get('Net Service Sales', 0) or 0),
+                            "net_sales": float(row.get('Net Sales', 0) or 0)
+                        }
+                    )
                 count += 1
                 
                 # Commit every 10 records
@@ -155,17 +175,12 @@ def upload_single_day_transactions():
                     session.commit()
                     print(f"    Processed {count} transactions...", end='\r')
                     
-            except Exception as e:
-                if "duplicate key" in str(e):
-                    duplicates += 1
-                else:
-                    errors += 1
-                    if errors <= 3:  # Show first 3 errors
-                        print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e}")
-                session.rollback()
-                # Start a new session after rollback
-                session.close()
-                session = Session()
+            except (IntegrityError, DataError) as e:
+                # Duplicates were filtered above, so this is a row the
+                # database rejected; its savepoint is already rolled back
+                errors += 1
+                if errors <= 3:  # Show first 3 errors
+                    print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e.orig}")
                 continue
         
         # Final commit
@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
 """
-Upload 6 more days of data (Jan 3-8, 2025) with double batch size
+Upload 6 more days of data (Jan 3-8, 2025) using COPY
 """
 
 import os
 import sys
 import pandas as pd
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from sqlalchemy import create_engine, text
+from sqlalchemy import String, bindparam, create_engine, text
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
 import time
 
+from copy_csv import COPY_OPTIONS, copy_buffer
+
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL', '')
 
@@ -19,10 +22,16 @@ if not DATABASE_URL:
     print("Please set your DATABASE_URL environment variable")
     sys.exit(1)
 
-# Create engine with NullPool to minimize connections
+# Days uploaded concurrently
+MAX_WORKERS = 3
+
+# One pooled connection per worker for the whole run so the TCP/TLS
+# handshake to the database is paid once per worker rather than per day
 engine = create_engine(
     DATABASE_URL, 
-    poolclass=NullPool,
+    pool_size=MAX_WORKERS,
+    max_overflow=0,
+    pool_pre_ping=True,
     connect_args={
         'connect_timeout': 10,
         'options': '-c statement_timeout=30000'
@@ -30,126 +39,190 @@ engine = create_engine(
 )
 Session = sessionmaker(bind=engine)
 
-# Double the batch size from before (was 10, now 20)
-BATCH_SIZE = 20
-
 # Target dates: Jan 3-8, 2025
 START_DATE = date(2025, 1, 3)
 END_DATE = date(2025, 1, 8)
 
-def process_transactions_for_date(target_date):
-    """Process transaction data for a specific date"""
-    print(f"\n📊 Processing Transactions for {target_date}...")
+# Built once with a typed bind parameter and reused for every new location
+INSERT_LOCATION = text(
+    "INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) "
+    "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id"
+).bindparams(bindparam('name', type_=String))
+
+# Rows per CSV chunk when streaming the transaction file
+CSV_CHUNK_SIZE = 100_000
+
+# Only the columns we load, with explicit types so pandas skips inference.
+# Repeated names are stored as categoricals.
+CSV_COLUMNS = [
+    'Sale id', 'Sale Date', 'Location Name', 'Staff Name',
+    'Client Name', 'Service Name', 'Sale Type',
+    'Net Service Sales', 'Net Sales'
+]
+CSV_DTYPES = {
+    'Sale id': 'string',
+    'Location Name': 'category',
+    'Staff Name': 'category',
+    'Sale Type': 'category',
+    'Service Name': 'category',
+    'Client Name': 'string',
+    'Net Service Sales': 'float64',
+    'Net Sales': 'float64'
+}
+
+# Columns loaded with COPY, in the order rows are written to the buffer
+COPY_COLUMNS = (
+    'sale_id, location_id, sale_date, client_name, staff_id, '
+    'service_name, sale_type, net_service_sales, net_sales'
+)
+
+def copy_transactions(conn, rows):
+    """Bulk load a day's rows with COPY, skipping sale_ids already stored.
     
+    Runs inside the caller's transaction on ``conn``.
+    """
+    if not rows:
+        return 0
+    
+    # None goes in as an explicit NULL marker; staff_id is None for
+    # unmatched staff and 'No Staff'
+    buf = copy_buffer(rows)
+    
+    cur = conn.connection.cursor()
+    # Bulk load: don't wait on the WAL flush at commit
+    cur.execute("SET LOCAL synchronous_commit = OFF")
+    # COPY has no ON CONFLICT, so stage the rows and dedup on insert
+    cur.execute("""CREATE TEMP TABLE tmp_transactions
+        (LIKE salon_transactions INCLUDING DEFAULTS) ON COMMIT DROP""")
+    cur.copy_expert(
+        f"COPY tmp_transactions ({COPY_COLUMNS}) FROM STDIN WITH ({COPY_OPTIONS})",
+        buf
+    )
+    # Validate server-side in the same statement that inserts
+    cur.execute(f"""INSERT INTO salon_transactions ({COPY_COLUMNS}, created_at)
+        SELECT {COPY_COLUMNS}, NOW() FROM tmp_transactions
+        WHERE sale_id IS NOT NULL
+          AND sale_date IS NOT NULL
+          AND location_id IS NOT NULL
+        ON CONFLICT (sale_id) DO NOTHING""")
+    return cur.rowcount
+
+def load_transactions_by_date(start_date, end_date):
+    """Stream the transaction CSV once and collect per-day frames.
+    
+    Only rows dated start_date..end_date are kept, so peak memory is one
+    CSV chunk plus the target days rather than the whole file.
+    """
     file_path = 'blazer/Detailed Line Item 2025 071825.csv'
-    session = Session()
-    count = 0
-    errors = 0
     
-    try:
-        # Read the CSV file
-        df = pd.read_csv(file_path)
+    day_frames = defaultdict(list)
+    for chunk in pd.read_csv(file_path,
+        usecols=CSV_COLUMNS,
+        dtype=CSV_DTYPES,
+        parse_dates=['Sale Date'],
+        chunksize=CSV_CHUNK_SIZE
+    ):
+        # Skip rows without a date and summary rows
+        chunk = chunk[chunk['Sale Date'].notna()]
+        chunk = chunk[chunk['Sale id'].notna()]
+        chunk = chunk[chunk['Sale id'] != 'All']
         
-        # Parse dates and filter for target date
-        df['Sale Date'] = pd.to_datetime(df['Sale Date'], errors='coerce')
-        df = df[df['Sale Date'].notna()]
-        df = df[df['Sale Date'].dt.date == target_date]
+        sale_dates = chunk['Sale Date'].dt.date
+        chunk = chunk[(sale_dates >= start_date) & (sale_dates <= end_date)]
         
-        # Skip summary rows
-        df = df[df['Sale id'] != 'All']
-        df = df[df['Sale id'].notna()]
+        for d, g in chunk.groupby(chunk['Sale Date'].dt.date):
+            day_frames[d].append(g)
+    
+    # Each chunk has its own category set; concat falls back to object
+    # dtype in that case, so re-apply the categoricals afterwards
+    categories = {c: 'category' for c, t in CSV_DTYPES.items() if t == 'category'}
+    amounts = ['Net Service Sales', 'Net Sales']
+    
+    by_date = {}
+    for d, frames in day_frames.items():
+        df = pd.concat(frames).astype(categories)
         
-        print(f"  Found {len(df)} transactions for {target_date}")
+        # pd.NA in a 'string' column can't be bound as a query parameter
+        df['Client Name'] = df['Client Name'].fillna('')
         
-        if len(df) == 0:
-            print("  No data found for this date!")
-            return 0
+        # Missing amounts count as zero
+        df[amounts] = df[amounts].fillna(0).astype('float64')
         
-        # Process each transaction
-        for idx, row in df.iterrows():
-            try:
-                # Get or create location
-                location_name = row['Location Name']
-                if pd.isna(location_name):
-                    continue
-                
-                location = session.execute(
-                    text("SELECT id FROM salon_locations WHERE name = :name"),
-                    {"name": location_name}
-                ).first()
-                
-                if not location:
-                    result = session.execute(
-                        text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                        {"name": location_name}
-                    )
-                    location_id = result.first()[0]
-                else:
-                    location_id = location[0]
-                
-                # Get staff (optional)
-                staff_name = row.get('Staff Name', '')
-                staff_id = None
-                
-                if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
-                    staff = session.execute(
-                        text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                        {"name": staff_name}
-                    ).first()
-                    staff_id = staff[0] if staff else None
-                
-                # Insert transaction
-                session.execute(
-                    text("""INSERT INTO salon_transactions 
-                    (sale_id, location_id, sale_date, client_name, 
-                     staff_id, service_name, sale_type, 
-                     net_service_sales, net_sales, created_at)
-                    VALUES (:sale_id, :loc, :sale_date, :client, 
-                            :staff, :service, :sale_type,
-                            :net_service, :net_sales, NOW())
-                    ON CONFLICT (sale_id) DO NOTHING"""),
-                    {
-                        "sale_id": row['Sale id'],
-                        "loc": location_id,
-                        "sale_date": row['Sale Date'].date(),
-                        "client": row.get('Client Name', ''),
-                        "staff": staff_id,
-                        "service": row.get('Service Name', ''),
-                        "sale_type": row.get('Sale Type', ''),
-                        "net_service": float(row.get('Net Service Sales', 0) or 0),
-                        "net_sales": float(row.get('Net Sales', 0) or 0)
-                    }
-                )
-                count += 1
-                
-                # Commit every BATCH_SIZE records (doubled from before)
-                if count % BATCH_SIZE == 0:
-                    session.commit()
-                    print(f"    Processed {count} transactions...", end='\r')
-                    time.sleep(0.3)  # Slightly shorter delay since batch is bigger
-                    
-            except Exception as e:
-                errors += 1
-                if errors <= 3:  # Show first 3 errors
-                    print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e}")
-                session.rollback()
-                # Start a new session after rollback
-                session.close()
-                session = Session()
-                continue
+        by_date[d] = df
+    
+    return by_date
+
+def process_transactions_for_date(target_date, by_date):
+    """Process transaction data for a specific date"""
+    # Days run on worker threads; collect this day's status lines and write
+    # them in one go so they don't interleave and stdout is flushed once
+    log = deque()
+    log.append(f"\n📊 Processing Transactions for {target_date}...")
+    try:
+        return _process_day(target_date, by_date, log)
+    finally:
+        print("\n".join(log), flush=True)
+
+def _process_day(target_date, by_date, log):
+    """Load one day's transactions, appending status lines to log"""
+    count = 0
+    
+    df = by_date.get(target_date)
+    if df is None:
+        df = pd.DataFrame()
+    
+    log.append(f"  Found {len(df)} transactions for {target_date}")
+    
+    if len(df) == 0:
+        log.append("  No data found for this date!")
+        return 0
+    
+    try:
+        # One connection and one transaction for the whole day: new
+        # locations and the COPY commit (or roll back) together
+        with engine.begin() as conn:
+            # Load the dimension tables once; per-row lookups stay in memory
+            loc_map = dict(conn.execute(text("SELECT name, id FROM salon_locations")).all())
+            staff_map = dict(conn.execute(text("SELECT full_name, id FROM salon_staff")).all())
+            
+            # Create any of today's locations that don't exist yet, once
+            # per distinct name rather than once per row
+            for location_name in df['Location Name'].cat.remove_unused_categories().cat.categories:
+                if location_name not in loc_map:
+                    result = conn.execute(INSERT_LOCATION, {"name": location_name})
+                    loc_map[location_name] = result.first()[0]
+            
+            # Resolve IDs for the whole day at once. Rows without a location
+            # are staged with a NULL location_id and rejected by the
+            # INSERT ... SELECT; unmatched staff become NULL.
+            staff_names = df['Staff Name'].astype(object)
+            staff_ids = staff_names.where(staff_names != 'No Staff').map(staff_map).astype('Int64')
+            location_ids = df['Location Name'].astype(object).map(loc_map).astype('Int64')
+            df = df.assign(
+                location_id=location_ids.astype(object).where(location_ids.notna(), None),
+                staff_id=staff_ids.astype(object).where(staff_ids.notna(), None),
+                sale_date=df['Sale Date'].dt.date
+            )
+            
+            # Same order as COPY_COLUMNS. A missing Service Name or Sale
+            # Type comes through as NaN, which copy_buffer writes as NULL.
+            rows = list(df[[
+                'Sale id', 'location_id', 'sale_date', 'Client Name', 'staff_id',
+                'Service Name', 'Sale Type', 'Net Service Sales', 'Net Sales'
+            ]].itertuples(index=False, name=None))
+            
+            # Load the whole day in a single COPY
+            count = copy_transactions(conn, rows)
         
-        # Final commit
-        session.commit()
-        print(f"\n  ✅ Uploaded {count} transactions for {target_date}")
+        log.append(f"\n  ✅ Uploaded {count} transactions for {target_date}")
         
-        if errors > 0:
-            print(f"  ⚠️  {errors} errors occurred")
+        rejected = len(rows) - count
+        if rejected > 0:
+            log.append(f"  ℹ️  {rejected} rows skipped (duplicates or missing location)")
         
     except Exception as e:
-        print(f"\n  ❌ Error processing transactions: {e}")
-        session.rollback()
-    finally:
-        session.close()
+        log.append(f"\n  ❌ Error processing transactions: {e}")
+        count = 0
     
     return count
 
@@ -195,27 +268,44 @@ def check_final_state():
         session.close()
 
 def main():
+    # Progress is flushed explicitly once per day
+    sys.stdout.reconfigure(line_buffering=False)
+    
     print("=" * 60)
     print("SIX DAY UPLOAD")
     print(f"Target: {START_DATE} to {END_DATE}")
-    print(f"Batch size: {BATCH_SIZE} records per commit (doubled)")
+    print(f"Load method: one COPY per day, {MAX_WORKERS} days at a time")
     print("=" * 60)
     
     start_time = time.time()
-    total_count = 0
     
-    # Process each day
-    current_date = START_DATE
-    while current_date <= END_DATE:
-        day_count = process_transactions_for_date(current_date)
-        total_count += day_count
-        
-        # Pause between days
-        if current_date < END_DATE:
-            print(f"\n  Pausing before next day...")
-            time.sleep(2)
+    # Parse the CSV once for all days
+    print("\nLoading transactions...")
+    by_date = load_transactions_by_date(START_DATE, END_DATE)
+    
+    # Days are independent transactions over disjoint sale ids, so upload
+    # them concurrently; each worker checks out its own connection
+    dates = [START_DATE + timedelta(days=i) for i in range((END_DATE - START_DATE).days + 1)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        total_count = sum(executor.map(
+            lambda d: process_transactions_for_date(d, by_date), dates
+        ))
+    
+    # Covering index so the daily breakdown in check_final_state can be
+    # answered by an index-only scan. CONCURRENTLY can't run inside a
+    # transaction, and the build may outlast the 30s statement timeout.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_salon_transaction_date_sales "
+            "ON salon_transactions (sale_date) INCLUDE (net_sales)"
+        ))
         
-        current_date += timedelta(days=1)
+        # Refresh planner statistics once after the bulk load. VACUUM also
+        # sets the visibility map, without which the freshly copied pages
+        # can't be served by the index-only scan.
+        conn.execute(text("VACUUM ANALYZE salon_transactions"))
+        conn.execute(text("RESET statement_timeout"))
     
     # Final summary
     elapsed = time.time() - start_time
@@ -3,22 +3,98 @@
 Test salon API endpoints to see what data is being returned
 """
 
+import asyncio
+import base64
+import httpx
+import os
 import requests
 import json
+import time
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from test_dashboard_direct import get_with_retry
 
 # API base URL
 API_BASE_URL = "https://ready-built-1.onrender.com"
 
+# Shared session so sync calls reuse one keep-alive TLS connection;
+# retry the transient gateway errors Render returns during cold starts
+session = requests.Session()
+session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
 # Test credentials
 EMAIL = "danny@nbrain.ai"
 PASSWORD = "Tm0bile#88"  # Updated password from user
 
-def login():
+# Tokens are reused across runs until shortly before they expire
+TOKEN_CACHE = os.path.expanduser("~/.cache/api-token.json")
+TOKEN_MIN_TTL = 60  # seconds
+
+def token_expiry(token):
+    """Read the exp claim from a JWT without verifying it"""
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp']
+    except (IndexError, KeyError, ValueError):
+        return None
+
+def read_token_cache():
+    """Return the whole token cache, or {} if there is none"""
+    try:
+        with open(TOKEN_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_token_cache(cache):
+    """Write the token cache, readable by the current user only"""
+    try:
+        os.makedirs(os.path.dirname(TOKEN_CACHE), exist_ok=True)
+        fd = os.open(TOKEN_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"⚠️  Could not cache token: {e}")
+
+def load_cached_token():
+    """Return a cached token for this server and user if it is still valid"""
+    cached = read_token_cache().get(f"{API_BASE_URL}|{EMAIL}")
+    if cached and cached['exp'] - time.time() > TOKEN_MIN_TTL:
+        return cached['token']
+    return None
+
+def save_cached_token(token):
+    """Store the token and its expiry for this server and user"""
+    exp = token_expiry(token)
+    if exp is None:
+        return
+    
+    cache = read_token_cache()
+    cache[f"{API_BASE_URL}|{EMAIL}"] = {"token": token, "exp": exp}
+    write_token_cache(cache)
+
+def clear_cached_token():
+    """Drop this server and user's token, e.g. after the server rejected it"""
+    cache = read_token_cache()
+    if cache.pop(f"{API_BASE_URL}|{EMAIL}", None) is not None:
+        write_token_cache(cache)
+
+def login(use_cache=True):
     """Login and get access token"""
+    token = load_cached_token() if use_cache else None
+    if token:
+        print("✓ Using cached token")
+        return token
+    
     print("Logging in...")
     # The login endpoint expects form data, not JSON
-    response = requests.post(
+    response = session.post(
         f"{API_BASE_URL}/login",
         data={
             "username": EMAIL,  # OAuth2 expects 'username' field
@@ -29,13 +105,19 @@ def login():
     if response.status_code == 200:
         data = response.json()
         print(f"✓ Login successful")
-        return data.get("access_token")
+        token = data.get("access_token")
+        if token:
+            save_cached_token(token)
+        return token
     else:
         print(f"✗ Login failed: {response.status_code} - {response.text}")
         return None
 
-def test_dashboard_endpoints(token):
-    """Test all dashboard endpoints"""
+async def test_dashboard_endpoints(token):
+    """Test all dashboard endpoints.
+    
+    Returns True if the server rejected the token.
+    """
     headers = {"Authorization": f"Bearer {token}"}
     
     endpoints = [
@@ -47,16 +129,28 @@ def test_dashboard_endpoints(token):
         "/api/salon/dashboard/alerts"
     ]
     
-    for endpoint in endpoints:
+    # Fire all requests at once; total time is the slowest endpoint
+    # rather than the sum of all of them
+    async with httpx.AsyncClient(
+        headers=headers,
+        timeout=30,
+        limits=httpx.Limits(max_connections=16),
+        # Retries failed connections; get_with_retry handles gateway errors
+        transport=httpx.AsyncHTTPTransport(retries=3)
+    ) as client:
+        responses = await asyncio.gather(
+            *[get_with_retry(client, f"{API_BASE_URL}{endpoint}") for endpoint in endpoints],
+            return_exceptions=True
+        )
+    
+    for endpoint, response in zip(endpoints, responses):
         print(f"\n{'='*60}")
         print(f"Testing: {endpoint}")
         print('='*60)
         
         try:
-            response = requests.get(
-                f"{API_BASE_URL}{endpoint}",
-                headers=headers
-            )
+            if isinstance(response, Exception):
+                raise response
             
             print(f"Status: {response.status_code}")
             
@@ -68,6 +162,11 @@ def test_dashboard_endpoints(token):
                 
         except Exception as e:
             print(f"Exception: {e}")
+    
+    return any(
+        not isinstance(response, Exception) and response.status_code == 401
+        for response in responses
+    )
 
 def test_raw_query(token):
     """Test raw database query through debug endpoint"""
@@ -78,7 +177,7 @@ def test_raw_query(token):
     headers = {"Authorization": f"Bearer {token}"}
     
     try:
-        response = requests.get(
+        response = session.get(
             f"{API_BASE_URL}/api/salon/debug/check-data",
             headers=headers
         )
@@ -104,8 +203,16 @@ def main():
         print("Failed to login. Exiting.")
         return
     
-    # Test endpoints
-    test_dashboard_endpoints(token)
+    # Test endpoints. A cached token can be revoked before it expires, so
+    # on a 401 drop it and log in again once instead of failing every run.
+    if asyncio.run(test_dashboard_endpoints(token)):
+        print("\n⚠️  Token rejected (401). Clearing the cached token and logging in again...")
+        clear_cached_token()
+        token = login(use_cache=False)
+        if not token:
+            print("Failed to login. Exiting.")
+            return
+        asyncio.run(test_dashboard_endpoints(token))
     
     # Test raw query if debug endpoint exists
     test_raw_query(token)
@@ -3,14 +3,29 @@
 Test dashboard endpoints directly to verify data
 """
 
-import requests
+import asyncio
+import httpx
 import json
 from datetime import datetime
 
 # Base URL for the API
 BASE_URL = "https://ready-built-1.onrender.com/api/salon"
 
-def test_endpoints():
+# Gateway errors Render returns while the service cold-starts. The async
+# transport's own retries only cover failed connections, not these.
+# test_api_endpoints imports get_with_retry from here.
+RETRY_STATUSES = {502, 503, 504}
+MAX_RETRIES = 3
+
+async def get_with_retry(client, url):
+    """GET url, retrying gateway errors with exponential backoff"""
+    for attempt in range(MAX_RETRIES + 1):
+        response = await client.get(url)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+        await asyncio.sleep(0.3 * 2 ** attempt)
+
+async def test_endpoints():
     """Test all dashboard endpoints"""
     
     print("=" * 60)
@@ -27,12 +42,26 @@ def test_endpoints():
         ("/analytics/daily-summary", "Daily Summary")
     ]
     
-    for endpoint, name in endpoints:
+    # Fire all requests at once; total time is the slowest endpoint
+    # rather than the sum of all of them
+    async with httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_connections=16),
+        # Retries failed connections; get_with_retry handles gateway errors
+        transport=httpx.AsyncHTTPTransport(retries=3)
+    ) as client:
+        responses = await asyncio.gather(
+            *[get_with_retry(client, f"{BASE_URL}{endpoint}") for endpoint, name in endpoints],
+            return_exceptions=True
+        )
+    
+    for (endpoint, name), response in zip(endpoints, responses):
         print(f"\n📊 Testing: {name}")
         print(f"   Endpoint: {endpoint}")
         
         try:
-            response = requests.get(f"{BASE_URL}{endpoint}", timeout=30)
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 200:
                 data = response.json()
@@ -58,7 +87,7 @@ def test_endpoints():
                 print(f"   ❌ Error: Status {response.status_code}")
                 print(f"      Response: {response.text[:200]}")
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print(f"   ⏱️  Timeout - endpoint may be slow")
         except Exception as e:
             print(f"   ❌ Error: {e}")
@@ -68,4 +97,4 @@ def test_endpoints():
     print("=" * 60)
 
 if __name__ == "__main__":
-    test_endpoints() 
\ No newline at end of file
+    asyncio.run(test_endpoints()) 
\ No newline at end of file
@@ -6,7 +6,7 @@ Test script - upload just 100 records with detailed debugging
 import os
 import sys
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import Date, Float, Integer, String, bindparam, create_engine, text
 from sqlalchemy.orm import sessionmaker
 import traceback
 
@@ -21,6 +21,31 @@ if not DATABASE_URL:
 engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
 Session = sessionmaker(bind=engine)
 
+# Statements are built once with typed bind parameters and reused
+INSERT_LOCATION = text(
+    "INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) "
+    "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id"
+).bindparams(bindparam('name', type_=String))
+
+INSERT_TX = text("""INSERT INTO salon_transactions 
+    (sale_id, location_id, sale_date, client_name, 
+     staff_id, service_name, sale_type, 
+     net_service_sales, net_sales, created_at)
+    VALUES (:sale_id, :loc, :sale_date, :client, 
+            :staff, :service, :sale_type,
+            :net_service, :net_sales, NOW())
+    ON CONFLICT (sale_id) DO NOTHING""").bindparams(
+    bindparam('sale_id', type_=String),
+    bindparam('loc', type_=Integer),
+    bindparam('sale_date', type_=Date),
+    bindparam('client', type_=String),
+    bindparam('staff', type_=Integer),
+    bindparam('service', type_=String),
+    bindparam('sale_type', type_=String),
+    bindparam('net_service', type_=Float),
+    bindparam('net_sales', type_=Float)
+)
+
 def check_database_state(session):
     """Check current database state"""
     print("\n" + "=" * 60)
@@ -64,125 +89,140 @@ def test_small_batch(session):
     
     # Read just first 100 non-summary rows
     print(f"\nReading first 100 rows from {file_path}...")
-    df = pd.read_csv(file_path, nrows=500)  # Read extra to account for summary rows
+    df = pd.read_csv(
+        file_path,
+        nrows=500,  # Read extra to account for summary rows
+        usecols=[
+            'Sale id', 'Sale Date', 'Location Name', 'Staff Name',
+            'Client Name', 'Service Name', 'Sale Type',
+            'Net Service Sales', 'Net Sales'
+        ],
+        dtype={
+            'Sale id': 'string',
+            'Location Name': 'category',
+            'Staff Name': 'category',
+            'Sale Type': 'category',
+            'Service Name': 'category',
+            'Client Name': 'string',
+            'Net Service Sales': 'float64',
+            'Net Sales': 'float64'
+        },
+        parse_dates=['Sale Date']
+    )
     
     # Filter out summary rows
-    df = df[df['Sale id'] != 'All']
     df = df[df['Sale id'].notna()]
+    df = df[df['Sale id'] != 'All']
+    
+    # Parse dates once for the whole column (a no-op if read_csv already
+    # parsed them) and drop rows whose date didn't parse
+    df['Sale Date'] = pd.to_datetime(df['Sale Date'], errors='coerce')
+    invalid_dates = df['Sale Date'].isna().sum()
+    if invalid_dates:
+        print(f"Skipping {invalid_dates} rows with invalid dates")
+    df = df[df['Sale Date'].notna()]
     df = df.head(100)
     
+    # pd.NA in a 'string' column can't be bound as a query parameter
+    df['Client Name'] = df['Client Name'].fillna('')
+    
+    # Missing amounts count as zero
+    amounts = ['Net Service Sales', 'Net Sales']
+    df[amounts] = df[amounts].fillna(0).astype('float64')
+    
     print(f"Found {len(df)} valid rows to process")
     
     # Show sample data
     print("\nSample data (first 3 rows):")
     print(df[['Sale id', 'Sale Date', 'Location Name', 'Staff Name', 'Net Sales']].head(3))
     
-    # Process each row
+    # Load the dimension tables once; per-row lookups stay in memory
+    loc_map = dict(session.execute(text("SELECT name, id FROM salon_locations")).all())
+    staff_map = dict(session.execute(text("SELECT full_name, id FROM salon_staff")).all())
+    
+    # Create missing locations once per distinct name, not per row
+    for location_name in df['Location Name'].cat.remove_unused_categories().cat.categories:
+        if location_name not in loc_map:
+            result = session.execute(INSERT_LOCATION, {"name": location_name})
+            loc_map[location_name] = result.first()[0]
+            print(f"\n  Created new location: {location_name} (ID: {loc_map[location_name]})")
+    
+    # Look up which of these sale IDs already exist in one query
+    candidate_ids = df['Sale id'].tolist()
+    existing_ids = {
+        r[0] for r in session.execute(
+            text("SELECT sale_id FROM salon_transactions WHERE sale_id = ANY(:ids)"),
+            {"ids": candidate_ids}
+        )
+    }
+    
     success_count = 0
     error_count = 0
-    duplicate_count = 0
     
-    for idx, row in df.iterrows():
+    # Skip sale IDs already stored, or repeated earlier in this file
+    duplicate_mask = df['Sale id'].isin(existing_ids) | df['Sale id'].duplicated()
+    duplicate_count = int(duplicate_mask.sum())
+    for sale_id in df.loc[duplicate_mask, 'Sale id'].head(3):  # Show first 3 duplicates
+        print(f"\n  Duplicate: Sale ID {sale_id} already exists")
+    df = df[~duplicate_mask]
+    
+    # Skip rows without a location
+    missing_location = df['Location Name'].isna()
+    error_count += int(missing_location.sum())
+    for sale_id in df.loc[missing_location, 'Sale id']:
+        print(f"\n  Missing location for Sale ID {sale_id}")
+    df = df[~missing_location]
+    
+    # Resolve IDs for the whole frame at once. Staff are optional:
+    # unmatched names become NULL.
+    staff_names = df['Staff Name'].astype(object)
+    staff_ids = staff_names.where(staff_names != 'No Staff').map(staff_map).astype('Int64')
+    df = df.assign(
+        location_id=df['Location Name'].astype(object).map(loc_map),
+        staff_id=staff_ids.astype(object).where(staff_ids.notna(), None),
+        sale_date=df['Sale Date'].dt.date
+    )
+    
+    # Log first few missing staff
+    unmatched = staff_names[staff_names.notna() & (staff_names != 'No Staff') & staff_ids.isna()]
+    for staff_name in unmatched.unique()[:3]:
+        print(f"  Staff '{staff_name}' not found in database")
+    
+    records = df[[
+        'Sale id', 'location_id', 'sale_date', 'Client Name', 'staff_id',
+        'Service Name', 'Sale Type', 'Net Service Sales', 'Net Sales'
+    ]].rename(columns={
+        'Sale id': 'sale_id',
+        'location_id': 'loc',
+        'Client Name': 'client',
+        'staff_id': 'staff',
+        'Service Name': 'service',
+        'Sale Type': 'sale_type',
+        'Net Service Sales': 'net_service',
+        'Net Sales': 'net_sales'
+    }).to_dict('records')
+    
+    # Insert all rows with a single executemany
+    if records:
         try:
-            sale_id = row.get('Sale id')
-            
-            # Check if this sale_id already exists
-            existing = session.execute(
-                text("SELECT 1 FROM salon_transactions WHERE sale_id = :sale_id"),
-                {"sale_id": sale_id}
-            ).first()
-            
-            if existing:
-                duplicate_count += 1
-                if duplicate_count <= 3:  # Show first 3 duplicates
-                    print(f"\n  Duplicate: Sale ID {sale_id} already exists")
-                continue
-            
-            # Parse date
-            sale_date = pd.to_datetime(row.get('Sale Date'), errors='coerce')
-            if pd.isna(sale_date):
-                print(f"\n  Invalid date for Sale ID {sale_id}")
-                error_count += 1
-                continue
-            
-            # Get location
-            location_name = row.get('Location Name', '')
-            if not location_name:
-                print(f"\n  Missing location for Sale ID {sale_id}")
-                error_count += 1
-                continue
-            
-            # Get or create location
-            location = session.execute(
-                text("SELECT id FROM salon_locations WHERE name = :name"),
-                {"name": location_name}
-            ).first()
-            
-            if not location:
-                result = session.execute(
-                    text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                    {"name": location_name}
-                )
-                location_id = result.first()[0]
-                print(f"\n  Created new location: {location_name} (ID: {location_id})")
-            else:
-                location_id = location[0]
-            
-            # Get staff (optional)
-            staff_name = row.get('Staff Name', '')
-            staff_id = None
-            
-            if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
-                staff = session.execute(
-                    text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                    {"name": staff_name}
-                ).first()
-                staff_id = staff[0] if staff else None
-                
-                if not staff_id and success_count < 3:  # Log first few missing staff
-                    print(f"  Staff '{staff_name}' not found in database")
-            
-            # Insert transaction
-            session.execute(
-                text("""INSERT INTO salon_transactions 
-                (sale_id, location_id, sale_date, client_name, 
-                 staff_id, service_name, sale_type, 
-                 net_service_sales, net_sales, created_at)
-                VALUES (:sale_id, :loc, :sale_date, :client, 
-                        :staff, :service, :sale_type,
-                        :net_service, :net_sales, NOW())"""),
-                {
-                    "sale_id": sale_id,
-                    "loc": location_id,
-                    "sale_date": sale_date.date(),
-                    "client": row.get('Client Name', ''),
-                    "staff": staff_id,
-                    "service": row.get('Service Name', ''),
-                    "sale_type": row.get('Sale Type', ''),
-                    "net_service": float(row.get('Net Service Sales', 0) or 0),
-                    "net_sales": float(row.get('Net Sales', 0) or 0)
-                }
-            )
-            
-            success_count += 1
+            session.execute(INSERT_TX, records)
+            success_count = len(records)
             
             # Show details for first successful insert
-            if success_count == 1:
-                print(f"\n✅ First successful insert:")
-                print(f"   Sale ID: {sale_id}")
-                print(f"   Date: {sale_date.date()}")
-                print(f"   Location: {location_name}")
-                print(f"   Staff: {staff_name or 'None'}")
-                print(f"   Net Sales: ${float(row.get('Net Sales', 0)):,.2f}")
+            first = records[0]
+            print(f"\n✅ First successful insert:")
+            print(f"   Sale ID: {first['sale_id']}")
+            print(f"   Date: {first['sale_date']}")
+            print(f"   Location: {df['Location Name'].iloc[0]}")
+            print(f"   Staff: {df['Staff Name'].iloc[0] if pd.notna(df['Staff Name'].iloc[0]) else 'None'}")
+            print(f"   Net Sales: ${first['net_sales']:,.2f}")
             
         except Exception as e:
-            error_count += 1
-            if error_count <= 3:  # Show first 3 errors
-                print(f"\n❌ Error with row {idx}:")
-                print(f"   Sale ID: {sale_id}")
-                print(f"   Error: {str(e)}")
-                if "duplicate key" not in str(e):
-                    traceback.print_exc()
+            error_count += len(records)
+            session.rollback()
+            print(f"\n❌ Error inserting batch of {len(records)} rows:")
+            print(f"   Error: {str(e)}")
+            traceback.print_exc()
     
     # Commit if any successes
     if success_count > 0:
@@ -7,10 +7,17 @@ import os
 import sys
 import pandas as pd
 import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-import time
+
+from copy_csv import (
+    SCHEDULE_COPY_COLUMNS, SECONDARY_INDEXES, SELECT_LOCATIONS, SELECT_STAFF,
+    TIME_CLOCK_COPY_COLUMNS, TRANSACTION_COLUMNS, TRANSACTION_COPY_COLUMNS,
+    TRANSACTION_DTYPES, copy_staged, drop_indexes, map_locations, rebuild_indexes
+)
 
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL', '')
@@ -19,8 +26,12 @@ if not DATABASE_URL:
     print("Please set your DATABASE_URL environment variable")
     sys.exit(1)
 
-# Create engine
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Concurrent COPY connections per upload
+COPY_WORKERS = 4
+
+# Create engine, sized for the three uploads running at once, each with
+# its own session plus COPY_WORKERS loaders
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_size=3 * (COPY_WORKERS + 1))
 Session = sessionmaker(bind=engine)
 
 # File mappings - only 2025 files
@@ -30,6 +41,32 @@ FILES = {
     'schedules': 'blazer/Schedule Records.csv'  # This contains data from multiple years
 }
 
+def copy_batch(table, columns, key, rows):
+    """Run copy_staged for one batch on its own session"""
+    session = Session()
+    try:
+        return copy_staged(session, table, columns, key, rows)
+    finally:
+        session.close()
+
+def copy_parallel(table, columns, key, batches):
+    """COPY batches concurrently, one pooled connection per worker.
+    
+    Yields each batch's inserted count in submission order, None for a
+    batch that failed. Each worker
+    stages into its own temp table, so batches never contend on staging.
+    Only a few batches are queued ahead of the workers, so batches built
+    lazily from a CSV reader aren't all held in memory.
+    """
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        pending = deque()
+        for rows in batches:
+            pending.append(executor.submit(copy_batch, table, columns, key, rows))
+            if len(pending) >= 2 * COPY_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
 def clear_tables(session):
     """Clear existing data from tables"""
     print("\nClearing existing data...")
@@ -47,6 +84,17 @@ def clear_tables(session):
             session.commit()
             print(f"  ✓ Cleared {count:,} records from {name}")
 
+def drop_secondary_indexes(session):
+    """Drop secondary indexes so the load doesn't maintain them per row"""
+    drop_indexes(session, SECONDARY_INDEXES)
+    print(f"  ✓ Dropped {len(SECONDARY_INDEXES)} secondary indexes for the load")
+
+def rebuild_secondary_indexes():
+    """Recreate the secondary indexes after the load"""
+    print("\nRebuilding indexes...")
+    rebuild_indexes(engine, SECONDARY_INDEXES)
+    print(f"  ✓ Rebuilt {len(SECONDARY_INDEXES)} indexes")
+
 def upload_transaction_data(session, file_path):
     """Upload 2025 transaction data"""
     print("\nUploading 2025 transaction data...")
@@ -54,93 +102,95 @@ def upload_transaction_data(session, file_path):
     chunk_size = 5000
     total_count = 0
     skipped_count = 0
+    failed_batches = 0
+    
+    # Load the dimension tables once; per-row lookups stay in memory
+    loc_map = dict(session.execute(SELECT_LOCATIONS).all())
+    staff_map = dict(session.execute(SELECT_STAFF).all())
+    
+    reader = pd.read_csv(
+        file_path,
+        chunksize=chunk_size,
+        usecols=TRANSACTION_COLUMNS,
+        dtype=TRANSACTION_DTYPES,
+        parse_dates=['Sale Date']
+    )
     
-    for chunk_num, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size), 1):
-        chunk_count = 0
+    def build_transaction_batch(chunk):
+        nonlocal skipped_count
+        batch = []
+        
+        # pd.NA in a 'string' column can't be written as a value
+        chunk['Client Name'] = chunk['Client Name'].fillna('')
+        
+        # Missing amounts count as zero
+        amounts = ['Net Service Sales', 'Net Sales']
+        chunk[amounts] = chunk[amounts].fillna(0)
         
-        for _, row in chunk.iterrows():
-            try:
-                # Skip summary rows
-                sale_id = row.get('Sale id')
-                if sale_id == 'All' or pd.isna(sale_id):
-                    continue
-                
-                # Parse date and filter for 2025 only
-                sale_date = pd.to_datetime(row.get('Sale Date'), errors='coerce')
-                if pd.isna(sale_date):
-                    continue
-                
-                # Skip if not 2025
-                if sale_date.year < 2025:
-                    skipped_count += 1
-                    continue
-                
-                # Get location
-                location_name = row.get('Location Name', '')
-                if not location_name:
-                    continue
-                
-                location = session.execute(
-                    text("SELECT id FROM salon_locations WHERE name = :name"),
-                    {"name": location_name}
-                ).first()
-                
-                if not location:
-                    result = session.execute(
-                        text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                        {"name": location_name}
-                    )
-                    location_id = result.first()[0]
-                else:
-                    location_id = location[0]
-                
-                # Get staff (optional)
-                staff_name = row.get('Staff Name', '')
-                staff_id = None
-                
-                if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
-                    staff = session.execute(
-                        text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                        {"name": staff_name}
-                    ).first()
-                    staff_id = staff[0] if staff else None
-                
-                # Insert transaction
-                session.execute(
-                    text("""INSERT INTO salon_transactions 
-                    (sale_id, location_id, sale_date, client_name, 
-                     staff_id, service_name, sale_type, 
-                     net_service_sales, net_sales, created_at)
-                    VALUES (:sale_id, :loc, :sale_date, :client, 
-                            :staff, :service, :sale_type,
-                            :net_service, :net_sales, NOW())"""),
-                    {
-                        "sale_id": sale_id,
-                        "loc": location_id,
-                        "sale_date": sale_date.date(),
-                        "client": row.get('Client Name', ''),
-                        "staff": staff_id,
-                        "service": row.get('Service Name', ''),
-                        "sale_type": row.get('Sale Type', ''),
-                        "net_service": float(row.get('Net Service Sales', 0) or 0),
-                        "net_sales": float(row.get('Net Sales', 0) or 0)
-                    }
-                )
-                chunk_count += 1
-                
-            except Exception as e:
-                if "duplicate key" not in str(e):
-                    print(f"  Error: {e}")
-                continue
+        # Parse dates (a no-op if read_csv already parsed them)
+        sale_dates = pd.to_datetime(chunk['Sale Date'], errors='coerce')
+        years = sale_dates.dt.year
+        skipped_count += int((years < 2025).sum())
         
-        session.commit()
+        # One mask for every row-level filter: summary rows, missing ids,
+        # locations or dates, and anything before 2025. Check notna before
+        # comparing to 'All' so pd.NA never reaches the mask.
+        sale_ids = chunk['Sale id']
+        valid = (
+            sale_ids.notna() & (sale_ids != 'All')
+            & chunk['Location Name'].notna()
+            & (years >= 2025)
+        )
+        chunk = chunk.assign(**{'Sale Date': sale_dates}).loc[valid]
+        
+        # Resolve the chunk's locations with one dict lookup per row,
+        # creating any new ones in a single statement
+        chunk = chunk.assign(location_id=map_locations(session, chunk['Location Name'], loc_map))
+        
+        # Plain tuples instead of a Series per row; spaces in column names
+        # become underscores so fields read as attributes
+        for row in chunk.rename(columns=lambda c: c.replace(' ', '_')).itertuples(index=False):
+            sale_id = row.Sale_id
+            sale_date = row.Sale_Date
+            location_id = row.location_id
+            
+            # Get staff (optional)
+            staff_name = getattr(row, 'Staff_Name', '')
+            staff_id = None
+            
+            if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
+                staff_id = staff_map.get(staff_name)
+            
+            # Queue transaction for the chunk's COPY
+            batch.append((
+                sale_id,
+                location_id,
+                sale_date.date(),
+                getattr(row, 'Client_Name', ''),
+                staff_id,
+                getattr(row, 'Service_Name', ''),
+                getattr(row, 'Sale_Type', ''),
+                float(getattr(row, 'Net_Service_Sales', 0) or 0),
+                float(getattr(row, 'Net_Sales', 0) or 0)
+            ))
+        return batch
+    
+    # One COPY per chunk, several chunks in flight while the next are read
+    chunk_counts = copy_parallel(
+        'salon_transactions', TRANSACTION_COPY_COLUMNS, 'sale_id',
+        (build_transaction_batch(chunk) for chunk in reader)
+    )
+    for chunk_num, chunk_count in enumerate(chunk_counts, 1):
+        if chunk_count is None:
+            failed_batches += 1
+            print(f"  Chunk {chunk_num}: ❌ failed, not loaded")
+            continue
         total_count += chunk_count
         print(f"  Chunk {chunk_num}: {chunk_count} records inserted (Total: {total_count:,})")
-        time.sleep(0.1)
     
     print(f"✓ Uploaded {total_count:,} transactions for 2025")
     print(f"  (Skipped {skipped_count:,} pre-2025 records)")
-    return total_count
+    return total_count, failed_batches
 
 def upload_timeclock_data(session, file_path):
     """Upload 2025 time clock data"""
@@ -148,78 +198,62 @@ def upload_timeclock_data(session, file_path):
     
     df = pd.read_csv(file_path)
     tc_count = 0
-    skipped_count = 0
+    failed_batches = 0
+    rows = []
     
-    for idx, row in df.iterrows():
-        try:
-            # Parse date and filter for 2025 only
-            clock_date = pd.to_datetime(row.get('Date'), errors='coerce')
-            if pd.isna(clock_date):
-                continue
-            
-            # Skip if not 2025
-            if clock_date.year < 2025:
-                skipped_count += 1
-                continue
-            
-            staff_name = row.get('Employee Name', '')
-            if not staff_name:
-                continue
-            
-            staff = session.execute(
-                text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                {"name": staff_name}
-            ).first()
-            
-            if not staff:
-                continue
-            
-            # Parse times
-            clock_in = pd.to_datetime(row.get('Clock In'), errors='coerce')
-            clock_out = pd.to_datetime(row.get('Clock Out'), errors='coerce')
-            
-            # Calculate hours
-            hours_worked = 0
-            minutes_worked = 0
-            if pd.notna(clock_in) and pd.notna(clock_out):
-                delta = clock_out - clock_in
-                hours_worked = delta.total_seconds() / 3600
-                minutes_worked = delta.total_seconds() / 60
-            
-            # Generate unique timecard_id
-            timecard_id = f"2025_tc_{idx}"
-            
-            session.execute(
-                text("""INSERT INTO salon_time_clock 
-                (timecard_id, staff_id, clock_date, clock_in, clock_out, 
-                 hours_clocked, minutes_clocked, created_at)
-                VALUES (:timecard_id, :staff, :date, :in_time, :out_time, 
-                        :hours, :minutes, NOW())"""),
-                {
-                    "timecard_id": timecard_id,
-                    "staff": staff[0],
-                    "date": clock_date.date(),
-                    "in_time": clock_in if pd.notna(clock_in) else None,
-                    "out_time": clock_out if pd.notna(clock_out) else None,
-                    "hours": float(hours_worked),
-                    "minutes": float(minutes_worked)
-                }
-            )
-            tc_count += 1
-            
-            if tc_count % 1000 == 0:
-                session.commit()
-                print(f"  Processed {tc_count:,} records...")
-                
-        except Exception as e:
-            if "duplicate key" not in str(e):
-                print(f"  Error: {e}")
+    # Parse all date/time columns at once and keep 2025 onwards
+    for col in ('Date', 'Clock In', 'Clock Out'):
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    skipped_count = int((df['Date'].dt.year < 2025).sum())
+    df = df[(df['Date'].dt.year >= 2025) & df['Employee Name'].notna()]
+    
+    # Worked time for every entry at once; zero when either time is missing
+    worked_seconds = (df['Clock Out'] - df['Clock In']).dt.total_seconds().fillna(0)
+    df = df.assign(
+        hours_clocked=worked_seconds / 3600,
+        minutes_clocked=worked_seconds / 60
+    )
+    
+    # Unique timecard_id from the original CSV row number, built
+    # for the whole column at once
+    df = df.assign(timecard_id='2025_tc_' + df.index.astype(str))
+    
+    staff_map = dict(session.execute(SELECT_STAFF).all())
+    
+    # Plain tuples instead of a Series per row; spaces in column names
+    # become underscores so fields read as attributes
+    for row in df.rename(columns=lambda c: c.replace(' ', '_')).itertuples():
+        clock_date = row.Date
+        
+        staff_id = staff_map.get(row.Employee_Name)
+        if not staff_id:
+            continue
+        
+        clock_in = row.Clock_In
+        clock_out = row.Clock_Out
+        
+        rows.append((
+            row.timecard_id,
+            staff_id,
+            clock_date.date(),
+            clock_in if pd.notna(clock_in) else None,
+            clock_out if pd.notna(clock_out) else None,
+            row.hours_clocked,
+            row.minutes_clocked
+        ))
+    
+    # Load 1000-row slices concurrently, each committed on its own
+    batches = (rows[i:i + 1000] for i in range(0, len(rows), 1000))
+    for count in copy_parallel('salon_time_clock', TIME_CLOCK_COPY_COLUMNS, 'timecard_id', batches):
+        if count is None:
+            failed_batches += 1
             continue
+        tc_count += count
+        print(f"  Processed {tc_count:,} records...")
     
-    session.commit()
     print(f"✓ Uploaded {tc_count:,} time clock entries for 2025")
     print(f"  (Skipped {skipped_count:,} pre-2025 records)")
-    return tc_count
+    return tc_count, failed_batches
 
 def upload_schedule_data(session, file_path):
     """Upload 2025 schedule data"""
@@ -227,85 +261,69 @@ def upload_schedule_data(session, file_path):
     
     df = pd.read_csv(file_path)
     sched_count = 0
-    skipped_count = 0
+    failed_batches = 0
+    rows = []
     
-    for idx, row in df.iterrows():
-        try:
-            # Parse date and filter for 2025 only
-            schedule_date = pd.to_datetime(row.get('Schedule Date'), errors='coerce')
-            if pd.isna(schedule_date):
-                continue
-            
-            # Skip if not 2025
-            if schedule_date.year < 2025:
-                skipped_count += 1
-                continue
-            
-            staff_name = row.get('Staff Name', '')
-            if not staff_name:
-                continue
-            
-            staff = session.execute(
-                text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                {"name": staff_name}
-            ).first()
-            
-            if not staff:
-                continue
-            
-            # Get location
-            location_name = row.get('Location', '')
-            location = session.execute(
-                text("SELECT id FROM salon_locations WHERE name = :name"),
-                {"name": location_name}
-            ).first()
-            
-            if not location:
-                result = session.execute(
-                    text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                    {"name": location_name}
-                )
-                location_id = result.first()[0]
-            else:
-                location_id = location[0]
-            
-            # Parse times
-            start_time = pd.to_datetime(row.get('Start Time'), errors='coerce')
-            end_time = pd.to_datetime(row.get('End Time'), errors='coerce')
-            
-            # Generate unique schedule_record_id
-            schedule_record_id = f"sched_2025_{idx}"
-            
-            session.execute(
-                text("""INSERT INTO salon_schedules 
-                (schedule_record_id, staff_id, location_id, schedule_date, 
-                 start_time, end_time, created_at)
-                VALUES (:schedule_record_id, :staff, :loc, :date, 
-                        :start, :end, NOW())"""),
-                {
-                    "schedule_record_id": schedule_record_id,
-                    "staff": staff[0],
-                    "loc": location_id,
-                    "date": schedule_date.date(),
-                    "start": start_time if pd.notna(start_time) else None,
-                    "end": end_time if pd.notna(end_time) else None
-                }
-            )
-            sched_count += 1
-            
-            if sched_count % 5000 == 0:
-                session.commit()
-                print(f"  Processed {sched_count:,} records...")
-                
-        except Exception as e:
-            if "duplicate key" not in str(e):
-                print(f"  Error: {e}")
+    # Parse all date/time columns at once and keep 2025 onwards
+    for col in ('Schedule Date', 'Start Time', 'End Time'):
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    skipped_count = int((df['Schedule Date'].dt.year < 2025).sum())
+    df = df[(df['Schedule Date'].dt.year >= 2025) & df['Staff Name'].notna()]
+    
+    # Unique schedule_record_id from the original CSV row number, built
+    # for the whole column at once
+    df = df.assign(schedule_record_id='sched_2025_' + df.index.astype(str))
+    
+    # Load the dimension tables once and resolve locations for the whole
+    # frame, creating new ones up front
+    loc_map = dict(session.execute(SELECT_LOCATIONS).all())
+    staff_map = dict(session.execute(SELECT_STAFF).all())
+    df = df.assign(location_id=map_locations(session, df['Location'], loc_map))
+    
+    # Plain tuples instead of a Series per row; spaces in column names
+    # become underscores so fields read as attributes
+    for row in df.rename(columns=lambda c: c.replace(' ', '_')).itertuples():
+        schedule_date = row.Schedule_Date
+        
+        staff_id = staff_map.get(row.Staff_Name)
+        if not staff_id:
+            continue
+        
+        start_time = row.Start_Time
+        end_time = row.End_Time
+        
+        rows.append((
+            row.schedule_record_id,
+            staff_id,
+            row.location_id,
+            schedule_date.date(),
+            start_time if pd.notna(start_time) else None,
+            end_time if pd.notna(end_time) else None
+        ))
+    
+    # Load 5000-row slices concurrently, each committed on its own
+    batches = (rows[i:i + 5000] for i in range(0, len(rows), 5000))
+    for count in copy_parallel('salon_schedules', SCHEDULE_COPY_COLUMNS, 'schedule_record_id', batches):
+        if count is None:
+            failed_batches += 1
             continue
+        sched_count += count
+        print(f"  Processed {sched_count:,} records...")
     
-    session.commit()
     print(f"✓ Uploaded {sched_count:,} schedule records for 2025")
     print(f"  (Skipped {skipped_count:,} pre-2025 records)")
-    return sched_count
+    return sched_count, failed_batches
+
+def run_upload(upload, file_path):
+    """Run one upload function on its own session.
+    
+    Returns (records inserted, batches that failed).
+    """
+    session = Session()
+    try:
+        return upload(session, file_path)
+    finally:
+        session.close()
 
 def main():
     print("=" * 60)
@@ -324,29 +342,43 @@ def main():
         
         # Clear existing data
         clear_tables(session)
+        drop_secondary_indexes(session)
         
-        # Track totals
+        # Track totals and batches that failed to load
         totals = {
             'transactions': 0,
             'timeclock': 0,
             'schedules': 0
         }
+        failed = dict.fromkeys(totals, 0)
         
-        # Upload transaction data (2025 only)
-        if os.path.exists(FILES['transactions']):
-            totals['transactions'] = upload_transaction_data(session, FILES['transactions'])
-        
-        # Upload time clock data (2025 only)
-        if os.path.exists(FILES['timeclock']):
-            totals['timeclock'] = upload_timeclock_data(session, FILES['timeclock'])
-        
-        # Upload schedule data (2025 only)
-        if os.path.exists(FILES['schedules']):
-            totals['schedules'] = upload_schedule_data(session, FILES['schedules'])
+        # The three tables don't depend on each other, so upload them
+        # concurrently, each on its own session and pooled connection.
+        # Locations shared between them are created with ON CONFLICT.
+        uploads = {
+            'transactions': upload_transaction_data,
+            'timeclock': upload_timeclock_data,
+            'schedules': upload_schedule_data
+        }
+        try:
+            with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+                futures = {
+                    key: executor.submit(run_upload, upload, FILES[key])
+                    for key, upload in uploads.items()
+                    if os.path.exists(FILES[key])
+                }
+                for key, future in futures.items():
+                    totals[key], failed[key] = future.result()
+        finally:
+            # Put the indexes back even if an upload failed
+            rebuild_secondary_indexes()
         
-        # Show final summary
+        # Show final summary; a failed batch means the load is incomplete
         print("\n" + "=" * 60)
-        print("✓ 2025 DATA UPLOAD COMPLETE!")
+        if any(failed.values()):
+            print("⚠️  2025 DATA UPLOAD INCOMPLETE")
+        else:
+            print("✓ 2025 DATA UPLOAD COMPLETE!")
         print("=" * 60)
         
         print("\nFinal counts (2025 data only):")
@@ -355,6 +387,13 @@ def main():
         print(f"  Schedules: {totals['schedules']:,} records")
         print(f"  Total: {sum(totals.values()):,} records")
         
+        if any(failed.values()):
+            print("\n❌ Batches that failed and were not loaded:")
+            for key, count in failed.items():
+                if count:
+                    print(f"  {key}: {count}")
+            print("  Re-run the upload; it clears the tables and reloads everything.")
+        
         # Expected rough estimates for 2025
         print("\nExpected estimates for 2025:")
         print("  Transactions: ~214,280")
@@ -371,4 +410,4 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
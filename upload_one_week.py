@@ -7,12 +7,18 @@ Optimized for Render's limited resources with proper error handling
 import os
 import sys
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
 import time
 
+from copy_csv import (
+    SCHEDULE_COPY_COLUMNS, SELECT_LOCATIONS, SELECT_STAFF, TIME_CLOCK_COPY_COLUMNS,
+    TRANSACTION_COLUMNS, TRANSACTION_COPY_COLUMNS, TRANSACTION_DTYPES,
+    copy_staged, map_locations
+)
+
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL', '')
 
@@ -20,10 +26,14 @@ if not DATABASE_URL:
     print("Please set your DATABASE_URL environment variable")
     sys.exit(1)
 
-# Create engine with NullPool to minimize connections
+# Pooled connections, so sessions reuse an open TCP/TLS connection
+# instead of reconnecting every time
 engine = create_engine(
     DATABASE_URL, 
-    poolclass=NullPool,
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=1800,
     connect_args={
         'connect_timeout': 10,
         'options': '-c statement_timeout=30000'
@@ -45,102 +55,79 @@ def process_transactions_for_week():
     
     try:
         # Read only the necessary columns to save memory
-        df = pd.read_csv(file_path, usecols=[
-            'Sale id', 'Sale Date', 'Location Name', 'Staff Name',
-            'Client Name', 'Service Name', 'Sale Type',
-            'Net Service Sales', 'Net Sales'
-        ])
+        df = pd.read_csv(
+            file_path,
+            usecols=TRANSACTION_COLUMNS,
+            dtype=TRANSACTION_DTYPES,
+            parse_dates=['Sale Date']
+        )
         
-        # Parse dates and filter for target week
+        # pd.NA in a 'string' column can't be bound as a query parameter
+        df['Client Name'] = df['Client Name'].fillna('')
+        
+        # Missing amounts count as zero
+        amounts = ['Net Service Sales', 'Net Sales']
+        df[amounts] = df[amounts].fillna(0)
+        
+        # Parse dates (a no-op if read_csv already parsed them)
         df['Sale Date'] = pd.to_datetime(df['Sale Date'], errors='coerce')
-        df = df[df['Sale Date'].notna()]
-        df = df[(df['Sale Date'].dt.date >= TARGET_START) & 
-                (df['Sale Date'].dt.date <= TARGET_END)]
+        sale_days = df['Sale Date'].dt.date
         
-        # Skip summary rows
-        df = df[df['Sale id'] != 'All']
-        df = df[df['Sale id'].notna()]
+        # One mask for every row-level filter: the target week, summary
+        # rows and missing ids or locations. Check notna before comparing
+        # to 'All' so pd.NA never reaches the mask.
+        valid = (
+            df['Sale Date'].notna()
+            & (sale_days >= TARGET_START) & (sale_days <= TARGET_END)
+            & df['Sale id'].notna() & (df['Sale id'] != 'All')
+            & df['Location Name'].notna()
+        )
+        df = df.loc[valid]
         
         print(f"  Found {len(df)} transactions for the week")
         
+        # Load the dimension tables once; per-row lookups stay in memory
+        loc_map = dict(session.execute(SELECT_LOCATIONS).all())
+        staff_map = dict(session.execute(SELECT_STAFF).all())
+        df = df.assign(location_id=map_locations(session, df['Location Name'], loc_map))
+        
+        rows = []
+        
         # Process each transaction
-        for idx, row in df.iterrows():
-            try:
-                # Get or create location
-                location_name = row['Location Name']
-                if pd.isna(location_name):
-                    continue
-                
-                location = session.execute(
-                    text("SELECT id FROM salon_locations WHERE name = :name"),
-                    {"name": location_name}
-                ).first()
-                
-                if not location:
-                    result = session.execute(
-                        text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                        {"name": location_name}
-                    )
-                    location_id = result.first()[0]
-                else:
-                    location_id = location[0]
-                
-                # Get staff (optional)
-                staff_name = row.get('Staff Name', '')
-                staff_id = None
-                
-                if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
-                    staff = session.execute(
-                        text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                        {"name": staff_name}
-                    ).first()
-                    staff_id = staff[0] if staff else None
-                
-                # Insert transaction
-                session.execute(
-                    text("""INSERT INTO salon_transactions 
-                    (sale_id, location_id, sale_date, client_name, 
-                     staff_id, service_name, sale_type, 
-                     net_service_sales, net_sales, created_at)
-                    VALUES (:sale_id, :loc, :sale_date, :client, 
-                            :staff, :service, :sale_type,
-                            :net_service, :net_sales, NOW())
-                    ON CONFLICT (sale_id) DO NOTHING"""),
-                    {
-                        "sale_id": row['Sale id'],
-                        "loc": location_id,
-                        "sale_date": row['Sale Date'].date(),
-                        "client": row.get('Client Name', ''),
-                        "staff": staff_id,
-                        "service": row.get('Service Name', ''),
-                        "sale_type": row.get('Sale Type', ''),
-                        "net_service": float(row.get('Net Service Sales', 0) or 0),
-                        "net_sales": float(row.get('Net Sales', 0) or 0)
-                    }
-                )
-                count += 1
-                
-                # Commit every 50 records
-                if count % 50 == 0:
-                    session.commit()
-                    print(f"    Processed {count} transactions...", end='\r')
-                    time.sleep(0.5)  # Small delay
-                    
-            except Exception as e:
-                print(f"\n  ⚠️  Error with transaction {row.get('Sale id', 'unknown')}: {e}")
-                session.rollback()
-                # Start a new session after rollback
-                session.close()
-                session = Session()
-                continue
+        # Plain tuples instead of a Series per row; spaces in column names
+        # become underscores so fields read as attributes
+        for row in df.rename(columns=lambda c: c.replace(' ', '_')).itertuples():
+            # Get staff (optional)
+            staff_name = getattr(row, 'Staff_Name', '')
+            staff_id = None
+            
+            if staff_name and staff_name != 'No Staff' and not pd.isna(staff_name):
+                staff_id = staff_map.get(staff_name)
+            
+            # Queue transaction for the week's COPY
+            rows.append((
+                row.Sale_id,
+                row.location_id,
+                row.Sale_Date.date(),
+                getattr(row, 'Client_Name', ''),
+                staff_id,
+                getattr(row, 'Service_Name', ''),
+                getattr(row, 'Sale_Type', ''),
+                float(getattr(row, 'Net_Service_Sales', 0) or 0),
+                float(getattr(row, 'Net_Sales', 0) or 0)
+            ))
         
-        # Final commit
-        session.commit()
-        print(f"\n  ✅ Uploaded {count} transactions for the week")
+        # Stage the whole week and insert it in one statement
+        count = copy_staged(session, 'salon_transactions', TRANSACTION_COPY_COLUMNS, 'sale_id', rows)
+        if count is None:
+            print(f"\n  ❌ No transactions loaded for the week")
+        else:
+            print(f"\n  ✅ Uploaded {count} transactions for the week")
         
     except Exception as e:
         print(f"\n  ❌ Error processing transactions: {e}")
         session.rollback()
+        count = None
     finally:
         session.close()
     
@@ -159,83 +146,64 @@ def process_timeclock_for_week():
         df = pd.read_csv(file_path)
         
         # Parse dates and filter for target week
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df = df[df['Date'].notna()]
-        df = df[(df['Date'].dt.date >= TARGET_START) & 
-                (df['Date'].dt.date <= TARGET_END)]
+        for col in ('Date', 'Clock In', 'Clock Out'):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        clock_days = df['Date'].dt.date
+        df = df[
+            df['Date'].notna()
+            & (clock_days >= TARGET_START) & (clock_days <= TARGET_END)
+            & df['Employee Name'].notna()
+        ]
         
         print(f"  Found {len(df)} time clock entries for the week")
         
+        # Worked time for every entry at once; zero when either time is missing
+        worked_seconds = (df['Clock Out'] - df['Clock In']).dt.total_seconds().fillna(0)
+        df = df.assign(
+            hours_clocked=worked_seconds / 3600,
+            minutes_clocked=worked_seconds / 60
+        )
+        
+        # Unique timecard_id from the original CSV row number, built
+        # for the whole column at once
+        df = df.assign(timecard_id='2025_w1_' + df.index.astype(str))
+        
+        staff_map = dict(session.execute(SELECT_STAFF).all())
+        
+        rows = []
+        
         # Process each entry
-        for idx, row in df.iterrows():
-            try:
-                staff_name = row.get('Employee Name', '')
-                if not staff_name:
-                    continue
-                
-                # Get staff
-                staff = session.execute(
-                    text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                    {"name": staff_name}
-                ).first()
-                
-                if not staff:
-                    continue
-                
-                # Parse times
-                clock_in = pd.to_datetime(row.get('Clock In'), errors='coerce')
-                clock_out = pd.to_datetime(row.get('Clock Out'), errors='coerce')
-                
-                # Calculate hours
-                hours_worked = 0
-                minutes_worked = 0
-                if pd.notna(clock_in) and pd.notna(clock_out):
-                    delta = clock_out - clock_in
-                    hours_worked = delta.total_seconds() / 3600
-                    minutes_worked = delta.total_seconds() / 60
-                
-                # Generate unique timecard_id
-                timecard_id = f"2025_w1_{idx}"
-                
-                session.execute(
-                    text("""INSERT INTO salon_time_clock 
-                    (timecard_id, staff_id, clock_date, clock_in, clock_out, 
-                     hours_clocked, minutes_clocked, created_at)
-                    VALUES (:timecard_id, :staff, :date, :in_time, :out_time, 
-                            :hours, :minutes, NOW())
-                    ON CONFLICT (timecard_id) DO NOTHING"""),
-                    {
-                        "timecard_id": timecard_id,
-                        "staff": staff[0],
-                        "date": row['Date'].date(),
-                        "in_time": clock_in if pd.notna(clock_in) else None,
-                        "out_time": clock_out if pd.notna(clock_out) else None,
-                        "hours": float(hours_worked),
-                        "minutes": float(minutes_worked)
-                    }
-                )
-                count += 1
-                
-                # Commit every 50 records
-                if count % 50 == 0:
-                    session.commit()
-                    print(f"    Processed {count} time clock entries...", end='\r')
-                    time.sleep(0.5)
-                    
-            except Exception as e:
-                print(f"\n  ⚠️  Error with time clock entry: {e}")
-                session.rollback()
-                session.close()
-                session = Session()
+        # Plain tuples instead of a Series per row; spaces in column names
+        # become underscores so fields read as attributes
+        for row in df.rename(columns=lambda c: c.replace(' ', '_')).itertuples():
+            staff_id = staff_map.get(row.Employee_Name)
+            if not staff_id:
                 continue
+            
+            clock_in = row.Clock_In
+            clock_out = row.Clock_Out
+            
+            rows.append((
+                row.timecard_id,
+                staff_id,
+                row.Date.date(),
+                clock_in if pd.notna(clock_in) else None,
+                clock_out if pd.notna(clock_out) else None,
+                row.hours_clocked,
+                row.minutes_clocked
+            ))
         
-        # Final commit
-        session.commit()
-        print(f"\n  ✅ Uploaded {count} time clock entries for the week")
+        # Stage the whole week and insert it in one statement
+        count = copy_staged(session, 'salon_time_clock', TIME_CLOCK_COPY_COLUMNS, 'timecard_id', rows)
+        if count is None:
+            print(f"\n  ❌ No time clock entries loaded for the week")
+        else:
+            print(f"\n  ✅ Uploaded {count} time clock entries for the week")
         
     except Exception as e:
         print(f"\n  ❌ Error processing time clock: {e}")
         session.rollback()
+        count = None
     finally:
         session.close()
     
@@ -254,90 +222,60 @@ def process_schedules_for_week():
         df = pd.read_csv(file_path)
         
         # Parse dates and filter for target week
-        df['Schedule Date'] = pd.to_datetime(df['Schedule Date'], errors='coerce')
-        df = df[df['Schedule Date'].notna()]
-        df = df[(df['Schedule Date'].dt.date >= TARGET_START) & 
-                (df['Schedule Date'].dt.date <= TARGET_END)]
+        for col in ('Schedule Date', 'Start Time', 'End Time'):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        schedule_days = df['Schedule Date'].dt.date
+        df = df[
+            df['Schedule Date'].notna()
+            & (schedule_days >= TARGET_START) & (schedule_days <= TARGET_END)
+            & df['Staff Name'].notna()
+        ]
         
         print(f"  Found {len(df)} schedule records for the week")
         
+        # Unique schedule_record_id from the original CSV row number, built
+        # for the whole column at once
+        df = df.assign(schedule_record_id='sched_2025_w1_' + df.index.astype(str))
+        
+        # Load the dimension tables once and resolve locations for the whole
+        # frame, creating new ones up front
+        loc_map = dict(session.execute(SELECT_LOCATIONS).all())
+        staff_map = dict(session.execute(SELECT_STAFF).all())
+        df = df.assign(location_id=map_locations(session, df['Location'], loc_map))
+        
+        rows = []
+        
         # Process each entry
-        for idx, row in df.iterrows():
-            try:
-                staff_name = row.get('Staff Name', '')
-                if not staff_name:
-                    continue
-                
-                # Get staff
-                staff = session.execute(
-                    text("SELECT id FROM salon_staff WHERE full_name = :name"),
-                    {"name": staff_name}
-                ).first()
-                
-                if not staff:
-                    continue
-                
-                # Get location
-                location_name = row.get('Location', '')
-                location = session.execute(
-                    text("SELECT id FROM salon_locations WHERE name = :name"),
-                    {"name": location_name}
-                ).first()
-                
-                if not location:
-                    result = session.execute(
-                        text("INSERT INTO salon_locations (name, is_active, created_at) VALUES (:name, true, NOW()) RETURNING id"),
-                        {"name": location_name}
-                    )
-                    location_id = result.first()[0]
-                else:
-                    location_id = location[0]
-                
-                # Parse times
-                start_time = pd.to_datetime(row.get('Start Time'), errors='coerce')
-                end_time = pd.to_datetime(row.get('End Time'), errors='coerce')
-                
-                # Generate unique schedule_record_id
-                schedule_record_id = f"sched_2025_w1_{idx}"
-                
-                session.execute(
-                    text("""INSERT INTO salon_schedules 
-                    (schedule_record_id, staff_id, location_id, schedule_date, 
-                     start_time, end_time, created_at)
-                    VALUES (:schedule_record_id, :staff, :loc, :date, 
-                            :start, :end, NOW())
-                    ON CONFLICT (schedule_record_id) DO NOTHING"""),
-                    {
-                        "schedule_record_id": schedule_record_id,
-                        "staff": staff[0],
-                        "loc": location_id,
-                        "date": row['Schedule Date'].date(),
-                        "start": start_time if pd.notna(start_time) else None,
-                        "end": end_time if pd.notna(end_time) else None
-                    }
-                )
-                count += 1
-                
-                # Commit every 50 records
-                if count % 50 == 0:
-                    session.commit()
-                    print(f"    Processed {count} schedule records...", end='\r')
-                    time.sleep(0.5)
-                    
-            except Exception as e:
-                print(f"\n  ⚠️  Error with schedule record: {e}")
-                session.rollback()
-                session.close()
-                session = Session()
+        # Plain tuples instead of a Series per row; spaces in column names
+        # become underscores so fields read as attributes
+        for row in df.rename(columns=lambda c: c.replace(' ', '_')).itertuples():
+            staff_id = staff_map.get(row.Staff_Name)
+            if not staff_id:
                 continue
+            
+            start_time = row.Start_Time
+            end_time = row.End_Time
+            
+            rows.append((
+                row.schedule_record_id,
+                staff_id,
+                row.location_id,
+                row.Schedule_Date.date(),
+                start_time if pd.notna(start_time) else None,
+                end_time if pd.notna(end_time) else None
+            ))
         
-        # Final commit
-        session.commit()
-        print(f"\n  ✅ Uploaded {count} schedule records for the week")
+        # Stage the whole week and insert it in one statement
+        count = copy_staged(session, 'salon_schedules', SCHEDULE_COPY_COLUMNS, 'schedule_record_id', rows)
+        if count is None:
+            print(f"\n  ❌ No schedule records loaded for the week")
+        else:
+            print(f"\n  ✅ Uploaded {count} schedule records for the week")
         
     except Exception as e:
         print(f"\n  ❌ Error processing schedules: {e}")
         session.rollback()
+        count = None
     finally:
         session.close()
     
@@ -389,27 +327,34 @@ def main():
     # Process each data type
     start_time = time.time()
     
-    trans_count = process_transactions_for_week()
-    time.sleep(2)  # Pause between categories
-    
-    tc_count = process_timeclock_for_week()
-    time.sleep(2)
+    # The three categories are independent; run them concurrently, each
+    # on its own session and pooled connection
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        trans_future = executor.submit(process_transactions_for_week)
+        tc_future = executor.submit(process_timeclock_for_week)
+        sched_future = executor.submit(process_schedules_for_week)
     
-    sched_count = process_schedules_for_week()
+    counts = {
+        'Transactions': trans_future.result(),
+        'Time Clock': tc_future.result(),
+        'Schedules': sched_future.result()
+    }
     
-    # Final summary
+    # Final summary; None means that category's load failed
     elapsed = time.time() - start_time
     print("\n" + "=" * 60)
-    print("✅ ONE WEEK UPLOAD COMPLETE")
+    if None in counts.values():
+        print("⚠️  ONE WEEK UPLOAD INCOMPLETE")
+    else:
+        print("✅ ONE WEEK UPLOAD COMPLETE")
     print("=" * 60)
     print(f"Time taken: {elapsed:.1f} seconds")
     print(f"\nRecords uploaded:")
-    print(f"  Transactions: {trans_count}")
-    print(f"  Time Clock: {tc_count}")
-    print(f"  Schedules: {sched_count}")
+    for name, count in counts.items():
+        print(f"  {name}: {'❌ failed' if count is None else count}")
     
     # Final status check
     check_database_status()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
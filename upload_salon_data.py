@@ -1,19 +1,117 @@
 #!/usr/bin/env python3
 """
 Script to upload Blazer salon data files to nBrain platform
+
+Usage:
+    python upload_salon_data.py                      # all files to nBrain
+    python upload_salon_data.py --profile render     # all files to Render
+    python upload_salon_data.py --only staff,schedules
 """
 
+import argparse
+import base64
+import contextlib
+import getpass
+import graphlib
+import gzip
+import hashlib
+import mmap
+import netrc
 import os
+import shutil
+import socket
 import sys
+import tempfile
+import threading
+import time
+import uuid
 import requests
 import json
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+# Stream multipart bodies from disk when requests-toolbelt is available
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+    STREAMING_AVAILABLE = True
+except ImportError:
+    STREAMING_AVAILABLE = False
+
+# Parse responses with orjson when it is installed; json.loads takes the
+# same bytes, just more slowly
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Deployments the script can upload to, selected with --profile
+PROFILES = {
+    'nbrain': {
+        'api_url': 'https://nbrain-backend.onrender.com',
+        'login_path': '/auth/login'
+    },
+    'render': {
+        'api_url': 'https://ready-built-1.onrender.com',
+        'login_path': '/login'
+    }
+}
+
+# Configuration, filled in from the profile by main(); API_URL overrides
+# the profile's server
+API_BASE_URL = None
+LOGIN_PATH = None
 
-# Configuration
-API_BASE_URL = os.getenv('API_URL', 'https://nbrain-backend.onrender.com')
+# Set by --verbose: full server responses are saved here, one file per
+# upload, instead of only the summary lines being printed
+RESPONSE_LOG_DIR = None
+
+# Server error bodies are cut to this many characters on screen
+ERROR_PREVIEW_CHARS = 200
 API_TOKEN = os.getenv('API_TOKEN', '')  # You'll need to set this
 
-# File mappings - ALL data files
+# Logged-in tokens are reused across runs until shortly before they expire
+TOKEN_CACHE = os.path.expanduser('~/.config/nbrain/token.json')
+TOKEN_MIN_TTL = 60  # seconds
+
+# Concurrent uploads once staff is loaded; keep at or below the
+# adapter's pool_maxsize so each upload gets its own connection. Separate
+# HTTP/1.1 connections are deliberate: multiplexing these bulk bodies as
+# HTTP/2 streams would squeeze them through one TCP window, and the
+# handshakes saved are a few out of minutes of transfer.
+MAX_WORKERS = 4
+
+# Files above this size are sent as byte ranges, so a dropped connection
+# only costs the chunk in flight instead of the whole file
+CHUNKED_UPLOAD_MIN_MB = 20
+CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_WORKERS = 4
+CHUNK_RETRIES = 3
+
+# CSVs above this size are gzipped before upload; the server gunzips
+# .csv.gz parts and chunked uploads marked as gzip
+GZIP_MIN_MB = 1
+
+# Single-POST bodies above this size are read through a memory map
+MMAP_MIN_MB = 4
+
+# Files below this size that become ready together share one POST to
+# /upload/batch, so the server parses, authenticates and opens a
+# transaction once for all of them
+BATCH_MAX_MB = 5
+
+# SHA-256 of every file the server accepted, keyed by server, endpoint and
+# path, so a re-run after a partial failure skips unchanged files. Delete
+# the file to force a full upload.
+UPLOAD_STATE_FILE = '.upload_state.json'
+upload_state_lock = threading.Lock()
+
+# File mappings - ALL data files. depends_on lists the uploads that must
+# finish first: the other files are matched to staff by name.
 FILES_TO_UPLOAD = {
     'staff': {
         'file': 'blazer/Emp List Active as of 1.1.24-7.31.25.csv',
@@ -23,49 +121,169 @@ FILES_TO_UPLOAD = {
     'performance_2024': {
         'file': 'blazer/Staff Performance_Utilization - All Salons 2024.csv',
         'endpoint': '/upload/performance',
-        'description': '2024 Performance Data'
+        'description': '2024 Performance Data',
+        'depends_on': ['staff']
     },
     'performance_2025': {
         'file': 'blazer/Staff Performance_Utilization - All Salons 2025 072725.csv',
         'endpoint': '/upload/performance',
-        'description': '2025 Performance Data'
+        'description': '2025 Performance Data',
+        'depends_on': ['staff']
     },
     'transactions_2024': {
         'file': 'blazer/Detailed Line Item 2024.csv',
         'endpoint': '/upload/transactions',
-        'description': '2024 Transaction Details'
+        'description': '2024 Transaction Details',
+        'depends_on': ['staff']
     },
     'transactions_2025': {
         'file': 'blazer/Detailed Line Item 2025 071825.csv',
         'endpoint': '/upload/transactions',
-        'description': '2025 Transaction Details'
+        'description': '2025 Transaction Details',
+        'depends_on': ['staff']
     },
     'timeclock_2024': {
         'file': 'blazer/Time Clock Data 2024.csv',
         'endpoint': '/upload/timeclock',
-        'description': '2024 Time Clock Data'
+        'description': '2024 Time Clock Data',
+        'depends_on': ['staff']
     },
     'timeclock_2025': {
         'file': 'blazer/Time Clock Data 2025 071825.csv',
         'endpoint': '/upload/timeclock',
-        'description': '2025 Time Clock Data'
+        'description': '2025 Time Clock Data',
+        'depends_on': ['staff']
     },
     'schedules': {
         'file': 'blazer/Schedule Records.csv',
         'endpoint': '/upload/schedules',
-        'description': 'Schedule Records'
+        'description': 'Schedule Records',
+        'depends_on': ['staff']
     }
 }
 
-def login_and_get_token():
+class UploadAdapter(HTTPAdapter):
+    """HTTPAdapter with a larger socket send buffer and TCP keepalive.
+    
+    The options are added to urllib3's defaults, which already turn off
+    Nagle's algorithm with TCP_NODELAY.
+    """
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            # Lets the kernel keep the link busy while a worker thread
+            # waits on the GIL or the disk
+            (socket.SOL_SOCKET, socket.SO_SNDBUF, 2 * 1024 * 1024),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+def make_session():
+    """Session that reuses keep-alive connections for the login and every upload"""
+    session = requests.Session()
+    session.headers['Accept'] = 'application/json'
+    # Retry the transient gateway errors Render returns during cold starts;
+    # POST isn't retried by default
+    adapter = UploadAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["POST"]
+        )
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    
+    # A streamed body can't be rewound, so uploads are only retried when
+    # the connection fails before anything is sent
+    session.mount(f"{API_BASE_URL}/api/salon/upload/", UploadAdapter(
+        pool_connections=4,
+        pool_maxsize=MAX_WORKERS * CHUNK_WORKERS,
+        max_retries=Retry(total=3, read=0, backoff_factor=0.5)
+    ))
+    return session
+
+class TokenRejected(Exception):
+    """The server answered an upload with 401"""
+
+def token_expiry(token):
+    """Read the exp claim from a JWT without verifying it"""
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp']
+    except (IndexError, KeyError, ValueError):
+        return None
+
+def read_token_cache():
+    try:
+        with open(TOKEN_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_token_cache(cache):
+    """Write the token cache, readable by the current user only"""
+    try:
+        os.makedirs(os.path.dirname(TOKEN_CACHE), exist_ok=True)
+        # Create the file as 0600 so it is never briefly world-readable
+        fd = os.open(TOKEN_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # The mode only applies on creation; tighten a file left by an older run
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"⚠️  Could not cache token: {e}")
+
+def load_cached_token():
+    """Return the cached token for this server if it is still valid"""
+    cached = read_token_cache().get(API_BASE_URL)
+    if cached and cached['exp'] - time.time() > TOKEN_MIN_TTL:
+        return cached['token']
+    return None
+
+def save_cached_token(token):
+    """Store the token and its expiry for this server"""
+    exp = token_expiry(token)
+    if exp is None:
+        return
+    cache = read_token_cache()
+    cache[API_BASE_URL] = {"token": token, "exp": exp}
+    write_token_cache(cache)
+
+def clear_cached_token():
+    """Forget this server's token after the server rejected it"""
+    cache = read_token_cache()
+    if cache.pop(API_BASE_URL, None):
+        write_token_cache(cache)
+
+def get_credentials():
+    """Find login credentials, prompting only as a last resort.
+    
+    Checks ~/.netrc for the API host first, then NBRAIN_USER/NBRAIN_PASS,
+    so scheduled runs never block on the terminal.
+    """
+    try:
+        auth = netrc.netrc().authenticators(urlparse(API_BASE_URL).hostname)
+    except (FileNotFoundError, netrc.NetrcParseError):
+        auth = None
+    if auth and auth[0] and auth[2]:
+        return auth[0], auth[2]
+    
+    username = os.environ.get('NBRAIN_USER') or input("Enter your username/email: ")
+    password = os.environ.get('NBRAIN_PASS') or getpass.getpass("Enter your password: ")
+    return username, password
+
+def login_and_get_token(session):
     """Login to get authentication token"""
-    # You'll need to provide credentials
-    username = input("Enter your username/email: ")
-    password = input("Enter your password: ")
+    username, password = get_credentials()
     
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/auth/login",
+        response = session.post(
+            f"{API_BASE_URL}{LOGIN_PATH}",
             data={
                 "username": username,
                 "password": password
@@ -73,114 +291,552 @@ def login_and_get_token():
         )
         
         if response.status_code == 200:
-            data = response.json()
-            return data.get('access_token')
+            data = json_loads(response.content)
+            token = data.get('access_token')
+            if token:
+                save_cached_token(token)
+            return token
         else:
-            print(f"Login failed: {response.status_code} - {response.text}")
+            print(f"Login failed: {response.status_code} - {response.text[:ERROR_PREVIEW_CHARS]}")
             return None
     except Exception as e:
         print(f"Login error: {e}")
         return None
 
-def upload_file(file_path, endpoint, token, description):
-    """Upload a single file to the specified endpoint"""
-    if not os.path.exists(file_path):
-        print(f"⚠️  File not found: {file_path}")
+def prefetch_files(paths):
+    """Start reading files into the page cache in the background.
+    
+    Files queued behind the worker pool are then already in memory when
+    their turn comes, instead of being hashed and sent straight off disk.
+    """
+    # posix_fadvise is only available on Unix
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+def read_sequentially(f):
+    """Tell the kernel f is read once front to back, so it reads further ahead"""
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+def file_digest(file_path):
+    """SHA-256 hex digest of a file"""
+    with open(file_path, 'rb') as f:
+        read_sequentially(f)
+        # file_digest (3.11+) hashes without holding the GIL
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+        return digest.hexdigest()
+
+def load_upload_state():
+    """Digests recorded by earlier runs"""
+    try:
+        with open(UPLOAD_STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_upload(state, state_key, digest):
+    """Remember a successful upload, rewriting the state file atomically"""
+    with upload_state_lock:
+        state[state_key] = digest
+        tmp_path = UPLOAD_STATE_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, UPLOAD_STATE_FILE)
+
+def save_response(key, response):
+    """Write a server response to RESPONSE_LOG_DIR as received; returns the path"""
+    os.makedirs(RESPONSE_LOG_DIR, exist_ok=True)
+    path = os.path.join(RESPONSE_LOG_DIR, f"{key}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    # The raw bytes are already JSON, so there is nothing to re-serialize
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    return path
+
+def preview_error(error):
+    """Server error text, cut short so one bad upload can't flood the log"""
+    if len(error) > ERROR_PREVIEW_CHARS:
+        error = error[:ERROR_PREVIEW_CHARS] + "..."
+    return error
+
+def log_counts(log, result):
+    """Append the record counts from an ingest result to log"""
+    if 'records_created' in result:
+        log.append(f"     - Records created: {result['records_created']}")
+    if 'records_skipped' in result:
+        log.append(f"     - Records skipped: {result['records_skipped']}")
+    if 'records_updated' in result:
+        log.append(f"     - Records updated: {result['records_updated']}")
+
+def upload_file(session, idx, key, state):
+    """Upload one entry of FILES_TO_UPLOAD"""
+    upload_info = FILES_TO_UPLOAD[key]
+    print(f"   ⬆️  Started {upload_info['description']}", flush=True)
+    
+    # Uploads run on worker threads; collect this file's status lines and
+    # write them in one go so they don't interleave with other uploads
+    log = deque()
+    log.append(f"\n{idx}. {upload_info['description']}:")
+    try:
+        return _upload_file(session, key, log, state)
+    except TokenRejected:
+        log.append("   ✗ Token rejected (401)")
+        return None
+    finally:
+        print("\n".join(log), flush=True)
+
+def gzip_file(file_path):
+    """Compress a file to a temp .csv.gz and return its path"""
+    with open(file_path, 'rb') as src, \
+            tempfile.NamedTemporaryFile(suffix='.csv.gz', delete=False) as tmp:
+        read_sequentially(src)
+        # Level 3 gets most of level 9's ratio on CSV text for far less CPU
+        with gzip.GzipFile(fileobj=tmp, mode='wb', compresslevel=3) as gz:
+            shutil.copyfileobj(src, gz, length=1024 * 1024)
+    return tmp.name
+
+class MappedBody:
+    """A memory-mapped file read as a request body.
+    
+    len() is the number of bytes left to read, which is how the multipart
+    encoder tracks its progress; a bare mmap always reports its full size.
+    """
+    
+    def __init__(self, mm):
+        self.mm = mm
+    
+    def read(self, size=-1):
+        return self.mm.read(size)
+    
+    def __len__(self):
+        return len(self.mm) - self.mm.tell()
+
+def map_file(f):
+    """Map f read-only, telling the kernel it is read front to back"""
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # madvise is only available on Unix
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+def post_file(session, file_path, file_name, url):
+    """Send a whole file in one multipart POST"""
+    with open(file_path, 'rb') as f, contextlib.ExitStack() as stack:
+        read_sequentially(f)
+        body = f
+        # Large bodies are copied straight out of the page cache instead of
+        # through a read() call per block. Windows keeps the file object,
+        # where mapped files interact poorly with streaming uploads.
+        if os.name != 'nt' and os.fstat(f.fileno()).st_size > MMAP_MIN_MB * 1024 * 1024:
+            body = MappedBody(stack.enter_context(map_file(f)))
+        
+        content_type = 'application/gzip' if file_name.endswith('.gz') else 'text/csv'
+        file_field = (file_name, body, content_type)
+        
+        if STREAMING_AVAILABLE:
+            # The encoder reads the file in small pieces as the socket
+            # sends them, instead of building the whole body in memory
+            encoder = MultipartEncoder(fields={'file': file_field})
+            return session.post(
+                url,
+                data=encoder,
+                # State the length up front so the body is never sent with
+                # chunked encoding and the proxy can reject oversize uploads
+                # before any bytes flow
+                headers={
+                    'Content-Type': encoder.content_type,
+                    'Content-Length': str(encoder.len)
+                },
+                timeout=(10, 300)  # 5 minute timeout for large files
+            )
+        return session.post(
+            url,
+            files={'file': file_field},
+            timeout=(10, 300)  # 5 minute timeout for large files
+        )
+
+def upload_chunked(session, file_path, url, file_size, gzipped):
+    """Send a file as concurrent byte ranges, then ask the server to ingest it.
+    
+    Each chunk is retried on its own with exponential backoff, so a
+    failure never re-sends the chunks that already arrived.
+    """
+    upload_id = uuid.uuid4().hex
+    
+    with open(file_path, 'rb') as f, \
+            map_file(f) as mm:
+        
+        def send_chunk(offset):
+            end = min(offset + CHUNK_SIZE, file_size) - 1
+            headers = {
+                'Content-Range': f'bytes {offset}-{end}/{file_size}',
+                'X-Upload-Id': upload_id
+            }
+            for attempt in range(CHUNK_RETRIES + 1):
+                if attempt:
+                    time.sleep(0.5 * 2 ** attempt)
+                try:
+                    response = session.put(
+                        f"{url}/chunk",
+                        data=mm[offset:end + 1],
+                        headers=headers,
+                        timeout=(10, 120)
+                    )
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if response.status_code == 200:
+                    return
+                # Re-raised by executor.map, so the caller can log in
+                # again and retry the whole file
+                if response.status_code == 401:
+                    raise TokenRejected()
+                error = f"{response.status_code} - {response.text[:ERROR_PREVIEW_CHARS]}"
+                # Only server-side failures are worth sending again
+                if response.status_code < 500:
+                    break
+            raise RuntimeError(f"chunk at byte {offset:,} failed: {error}")
+        
+        with ThreadPoolExecutor(max_workers=CHUNK_WORKERS) as executor:
+            list(executor.map(send_chunk, range(0, file_size, CHUNK_SIZE)))
+    
+    headers = {'X-Upload-Id': upload_id, 'X-Upload-Size': str(file_size)}
+    if gzipped:
+        headers['X-Upload-Encoding'] = 'gzip'
+    return session.post(
+        f"{url}/complete",
+        headers=headers,
+        timeout=(10, 300)  # ingesting a large file takes a while
+    )
+
+def _upload_file(session, key, log, state):
+    """Upload a single file to its endpoint, appending status lines to log"""
+    file_path = FILES_TO_UPLOAD[key]['file']
+    endpoint = FILES_TO_UPLOAD[key]['endpoint']
+    
+    # One stat for both the existence check and the size
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        log.append(f"⚠️  File not found: {file_path}")
         return False
     
     # Get file size
-    file_size = os.path.getsize(file_path) / (1024 * 1024)  # Size in MB
-    print(f"   File size: {file_size:.1f} MB")
+    file_size = st.st_size / (1024 * 1024)  # Size in MB
+    log.append(f"   File size: {file_size:.1f} MB")
+    
+    # Hashing is one local read; re-sending the same content is minutes
+    # of network time
+    state_key = f"{API_BASE_URL}{endpoint}|{file_path}"
+    digest = file_digest(file_path)
+    if state.get(state_key) == digest:
+        log.append("   ✓ Unchanged since the last successful upload, skipped")
+        return True
     
     if file_size > 50:
-        print(f"   ⚠️  Large file - upload may take a while...")
+        log.append(f"   ⚠️  Large file - upload may take a while...")
     
+    url = f"{API_BASE_URL}/api/salon{endpoint}"
+    upload_path = file_path
+    upload_name = os.path.basename(file_path)
+    start_time = time.time()
     try:
-        with open(file_path, 'rb') as f:
-            files = {'file': (os.path.basename(file_path), f, 'text/csv')}
-            headers = {'Authorization': f'Bearer {token}'}
+        # The uploads are network-bound and CSV compresses several times over
+        upload_size = st.st_size
+        if file_size > GZIP_MIN_MB:
+            upload_path = gzip_file(file_path)
+            upload_name += '.gz'
+            upload_size = os.stat(upload_path).st_size
+            log.append(f"   Compressed to {upload_size / (1024 * 1024):.1f} MB")
+        
+        if upload_size > CHUNKED_UPLOAD_MIN_MB * 1024 * 1024:
+            log.append(f"   Uploading to {endpoint} in {CHUNK_SIZE // (1024 * 1024)} MB chunks...")
+            response = upload_chunked(session, upload_path, url, upload_size, upload_path != file_path)
+        else:
+            log.append(f"   Uploading to {endpoint}...")
+            response = post_file(session, upload_path, upload_name, url)
+        
+        elapsed = time.time() - start_time
+        if RESPONSE_LOG_DIR:
+            log.append(f"   Response saved to {save_response(key, response)}")
+        if response.status_code == 401:
+            raise TokenRejected()
+        if response.status_code == 200:
+            result = json_loads(response.content)
+            log.append(f"   ✓ Success! (took {elapsed:.1f} seconds)")
+            log_counts(log, result)
+            record_upload(state, state_key, digest)
+            return True
+        else:
+            log.append(f"   ✗ Failed! (after {elapsed:.1f} seconds)")
+            log.append(f"     - Status: {response.status_code}")
+            log.append(f"     - Error: {preview_error(response.text)}")
+            return False
             
-            print(f"   Uploading to {endpoint}...")
-            response = requests.post(
-                f"{API_BASE_URL}/api/salon{endpoint}",
+    except requests.exceptions.Timeout:
+        log.append(f"   ✗ Upload timed out (file too large)")
+        return False
+    except TokenRejected:
+        raise
+    except Exception as e:
+        log.append(f"   ✗ Error: {e}")
+        return False
+    finally:
+        if upload_path != file_path:
+            os.remove(upload_path)
+
+def upload_batch(session, idx, keys, state):
+    """Upload several small entries of FILES_TO_UPLOAD in one request.
+    
+    Maps each key to True, False, or None if the token was rejected.
+    """
+    descriptions = ", ".join(FILES_TO_UPLOAD[key]['description'] for key in keys)
+    print(f"   ⬆️  Started {descriptions} (one request)", flush=True)
+    
+    log = deque()
+    log.append(f"\n{idx}-{idx + len(keys) - 1}. Batch of {descriptions}:")
+    try:
+        return _upload_batch(session, keys, log, state)
+    except TokenRejected:
+        log.append("   ✗ Token rejected (401)")
+        return dict.fromkeys(keys)
+    finally:
+        print("\n".join(log), flush=True)
+
+def _upload_batch(session, keys, log, state):
+    """Send files as the parts of one POST to /upload/batch, appending status lines to log"""
+    results = {}
+    pending = {}
+    for key in keys:
+        file_path = FILES_TO_UPLOAD[key]['file']
+        state_key = f"{API_BASE_URL}{FILES_TO_UPLOAD[key]['endpoint']}|{file_path}"
+        digest = file_digest(file_path)
+        if state.get(state_key) == digest:
+            log.append(f"   ✓ {FILES_TO_UPLOAD[key]['description']}: unchanged since the last successful upload, skipped")
+            results[key] = True
+        else:
+            pending[key] = (state_key, digest)
+    if not pending:
+        return results
+    
+    temp_paths = []
+    start_time = time.time()
+    try:
+        with contextlib.ExitStack() as stack:
+            files = {}
+            # Which ingester the server should route each part to
+            kinds = {}
+            for key in pending:
+                file_path = FILES_TO_UPLOAD[key]['file']
+                upload_path = file_path
+                upload_name = os.path.basename(file_path)
+                if os.stat(file_path).st_size > GZIP_MIN_MB * 1024 * 1024:
+                    upload_path = gzip_file(file_path)
+                    temp_paths.append(upload_path)
+                    upload_name += '.gz'
+                content_type = 'application/gzip' if upload_name.endswith('.gz') else 'text/csv'
+                part = f"{key}_file"
+                files[part] = (upload_name, stack.enter_context(open(upload_path, 'rb')), content_type)
+                kinds[part] = FILES_TO_UPLOAD[key]['endpoint'].rsplit('/', 1)[1]
+            
+            log.append(f"   Uploading {len(pending)} files to /upload/batch...")
+            # The parts are small, so there is nothing to gain from streaming
+            response = session.post(
+                f"{API_BASE_URL}/api/salon/upload/batch",
+                data={'kinds': json.dumps(kinds)},
                 files=files,
-                headers=headers,
-                timeout=300  # 5 minute timeout for large files
+                timeout=(10, 300)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"   ✓ Success!")
-                if 'records_created' in result:
-                    print(f"     - Records created: {result['records_created']}")
-                if 'records_skipped' in result:
-                    print(f"     - Records skipped: {result['records_skipped']}")
-                if 'records_updated' in result:
-                    print(f"     - Records updated: {result['records_updated']}")
-                return True
+        
+        elapsed = time.time() - start_time
+        if RESPONSE_LOG_DIR:
+            log.append(f"   Response saved to {save_response('batch', response)}")
+        if response.status_code == 401:
+            raise TokenRejected()
+        if response.status_code != 200:
+            log.append(f"   ✗ Failed! (after {elapsed:.1f} seconds)")
+            log.append(f"     - Status: {response.status_code}")
+            log.append(f"     - Error: {preview_error(response.text)}")
+            results.update(dict.fromkeys(pending, False))
+            return results
+        
+        # Each file succeeds or fails on its own
+        body = json_loads(response.content)
+        log.append(f"   Request finished in {elapsed:.1f} seconds")
+        for key, (state_key, digest) in pending.items():
+            result = body.get(f"{key}_file", {})
+            description = FILES_TO_UPLOAD[key]['description']
+            if result.get('success'):
+                log.append(f"   ✓ {description}")
+                log_counts(log, result)
+                record_upload(state, state_key, digest)
+                results[key] = True
             else:
-                print(f"   ✗ Failed!")
-                print(f"     - Status: {response.status_code}")
-                print(f"     - Error: {response.text}")
-                return False
-                
+                log.append(f"   ✗ {description} failed")
+                log.append(f"     - Error: {preview_error(str(result.get('error')))}")
+                results[key] = False
+        return results
+    
     except requests.exceptions.Timeout:
-        print(f"   ✗ Upload timed out (file too large)")
-        return False
+        log.append(f"   ✗ Upload timed out")
+    except TokenRejected:
+        raise
     except Exception as e:
-        print(f"   ✗ Error: {e}")
-        return False
+        log.append(f"   ✗ Error: {e}")
+    finally:
+        for path in temp_paths:
+            os.remove(path)
+    results.update(dict.fromkeys(pending, False))
+    return results
 
-def main():
-    print("=== Salon Data Upload Script (ALL DATA) ===")
-    print(f"API URL: {API_BASE_URL}")
+def plan_uploads(upload_order):
+    """Stat every file before anything is sent.
+    
+    Returns the keys to upload, largest first, or None if any file is
+    missing or empty.
+    """
+    plan = []
+    problems = []
+    for key in upload_order:
+        path = FILES_TO_UPLOAD[key]['file']
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            problems.append(f"  ✗ Not found: {path}")
+            continue
+        if size == 0:
+            problems.append(f"  ✗ Empty: {path}")
+            continue
+        plan.append((key, size))
+    
+    if problems:
+        print("Cannot start, some files are missing or empty:")
+        print("\n".join(problems))
+        return None
+    
+    # Starting the longest uploads first and fitting the short ones in
+    # around them keeps the total close to the longest single upload
+    plan.sort(key=lambda item: -item[1])
+    
+    total_mb = sum(size for _, size in plan) / (1024 * 1024)
+    print(f"Will upload {len(plan)} files, {total_mb:.1f} MB total:")
+    for key, size in plan:
+        print(f"  {FILES_TO_UPLOAD[key]['description']:<28} {size / (1024 * 1024):8.1f} MB")
     print()
+    return [key for key, _ in plan]
+
+def run_uploads(session, upload_order, state):
+    """Upload the given files, each as soon as the uploads it depends on finish.
+    
+    Maps each key to True, False, or None if the token was rejected.
+    """
+    position = {key: idx for idx, key in enumerate(upload_order)}
+    small = {
+        key for key in upload_order
+        if os.stat(FILES_TO_UPLOAD[key]['file']).st_size < BATCH_MAX_MB * 1024 * 1024
+    }
+    # Dependencies outside this run (see --only) are assumed loaded
+    sorter = graphlib.TopologicalSorter({
+        key: [dep for dep in FILES_TO_UPLOAD[key].get('depends_on', []) if dep in position]
+        for key in upload_order
+    })
+    sorter.prepare()
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        running = {}
+        while sorter.is_active():
+            # Queue everything that became ready, keeping the plan's order;
+            # files are numbered in the order they are queued
+            ready = sorted(sorter.get_ready(), key=position.get)
+            batch = [key for key in ready if key in small]
+            if len(batch) < 2:
+                batch = []
+            for key in ready:
+                if key not in batch:
+                    idx = len(results) + sum(map(len, running.values())) + 1
+                    running[executor.submit(upload_file, session, idx, key, state)] = [key]
+            # Small files that became ready together go in one request,
+            # queued after the large ones so those start first
+            if batch:
+                idx = len(results) + sum(map(len, running.values())) + 1
+                running[executor.submit(upload_batch, session, idx, batch, state)] = batch
+            
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                keys = running.pop(future)
+                outcome = future.result()
+                results.update(outcome if isinstance(outcome, dict) else {keys[0]: outcome})
+                # Dependents still run after a failure, as they always have
+                sorter.done(*keys)
+    return results
+
+def upload_all(session, upload_order):
+    """Authenticate, then upload the given files over the shared session.
     
-    # Get authentication token
-    token = API_TOKEN
-    if not token:
+    Returns True if every file was uploaded.
+    """
+    # Get authentication token: API_TOKEN, then a cached login, then a prompt
+    token = API_TOKEN or load_cached_token()
+    token_from_cache = bool(token) and not API_TOKEN
+    if token_from_cache:
+        print("✓ Using cached token")
+    elif not token:
         print("No API_TOKEN found. Please login:")
-        token = login_and_get_token()
+        token = login_and_get_token(session)
         if not token:
             print("Failed to authenticate. Exiting.")
             sys.exit(1)
     
+    # Sent with every upload from here on
+    session.headers['Authorization'] = f'Bearer {token}'
+    
     print("\nStarting data upload...")
     print("=" * 60)
     
     # Track results
     successful_uploads = []
     failed_uploads = []
+    start_time = time.time()
     
-    # Upload in order: staff first, then performance, then transactions, etc.
-    upload_order = [
-        'staff',
-        'performance_2024',
-        'performance_2025',
-        'transactions_2024',
-        'transactions_2025',
-        'timeclock_2024',
-        'timeclock_2025',
-        'schedules'
-    ]
-    
-    for idx, key in enumerate(upload_order, 1):
-        upload_info = FILES_TO_UPLOAD[key]
-        print(f"\n{idx}. {upload_info['description']}:")
-        
-        if upload_file(
-            upload_info['file'],
-            upload_info['endpoint'],
-            token,
-            upload_info['description']
-        ):
-            successful_uploads.append(upload_info['description'])
+    prefetch_files(FILES_TO_UPLOAD[key]['file'] for key in upload_order)
+    state = load_upload_state()
+    results = run_uploads(session, upload_order, state)
+    
+    # A cached token can be revoked before it expires; log in again once
+    # and retry only the uploads it failed
+    rejected = [key for key in upload_order if results[key] is None]
+    if rejected and token_from_cache:
+        print("\n⚠️  Cached token was rejected. Please login again:")
+        clear_cached_token()
+        token = login_and_get_token(session)
+        if token:
+            session.headers['Authorization'] = f'Bearer {token}'
+            results.update(run_uploads(session, rejected, state))
+    
+    for key in upload_order:
+        if results[key]:
+            successful_uploads.append(FILES_TO_UPLOAD[key]['description'])
         else:
-            failed_uploads.append(upload_info['description'])
+            failed_uploads.append(FILES_TO_UPLOAD[key]['description'])
     
     # Summary
+    total_time = time.time() - start_time
     print("\n" + "=" * 60)
     print("UPLOAD SUMMARY:")
+    print(f"Total time: {total_time:.1f} seconds ({total_time/60:.1f} minutes)")
     print(f"✓ Successful: {len(successful_uploads)}")
     for item in successful_uploads:
         print(f"  - {item}")
@@ -193,7 +849,7 @@ def main():
     print("\n" + "=" * 60)
     print("Upload process completed!")
     
-    if len(successful_uploads) == len(FILES_TO_UPLOAD):
+    if not failed_uploads:
         print("\n🎉 All data uploaded successfully!")
         print("\nYou can now:")
         print("- View the complete dashboard at: https://nbrain-frontend.onrender.com")
@@ -205,6 +861,63 @@ def main():
         print("  • Client retention patterns")
     else:
         print("\n⚠️  Some uploads failed. Please check the errors above.")
+        print("You may need to:")
+        print("   1. Check if the tables are created (run migrations)")
+        print("   2. Verify file formats match expected schemas")
+        print("   3. Re-run with --only to retry just the failed files")
+    
+    return not failed_uploads
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload Blazer salon data files")
+    parser.add_argument(
+        '--profile',
+        choices=sorted(PROFILES),
+        default='nbrain',
+        help="deployment to upload to (default: nbrain)"
+    )
+    parser.add_argument(
+        '--only',
+        help=f"comma-separated files to upload, from: {', '.join(FILES_TO_UPLOAD)}"
+    )
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help="save each full server response under logs/"
+    )
+    args = parser.parse_args()
+    
+    if args.only:
+        keys = [key.strip() for key in args.only.split(',') if key.strip()]
+        unknown = [key for key in keys if key not in FILES_TO_UPLOAD]
+        if unknown:
+            parser.error(f"unknown file(s): {', '.join(unknown)}")
+        # Keep the FILES_TO_UPLOAD order so staff still goes first
+        args.only = [key for key in FILES_TO_UPLOAD if key in keys]
+    return args
+
+def main():
+    global API_BASE_URL, LOGIN_PATH, RESPONSE_LOG_DIR
+    
+    args = parse_args()
+    profile = PROFILES[args.profile]
+    API_BASE_URL = os.getenv('API_URL', profile['api_url'])
+    LOGIN_PATH = profile['login_path']
+    if args.verbose:
+        RESPONSE_LOG_DIR = 'logs'
+    upload_order = args.only or list(FILES_TO_UPLOAD)
+    
+    print("=== Salon Data Upload Script ===")
+    print(f"API URL: {API_BASE_URL}")
+    print()
+    
+    # Check every file before logging in or sending anything
+    upload_order = plan_uploads(upload_order)
+    if upload_order is None:
+        return 1
+    
+    with make_session() as session:
+        return 0 if upload_all(session, upload_order) else 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file